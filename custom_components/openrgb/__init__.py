@@ -2,36 +2,74 @@
 import asyncio
 import logging
 
-from openrgb import OpenRGBClient
+from openrgb import OpenRGBClient, utils as RGBUtils
 import voluptuous as vol
 
 from homeassistant.config_entries import ConfigEntry, SOURCE_IMPORT
 from homeassistant.const import CONF_CLIENT_ID, CONF_HOST, CONF_PORT
 import homeassistant.helpers.config_validation as cv
+from homeassistant.helpers import entity_registry as er
 from homeassistant.helpers.dispatcher import async_dispatcher_send, dispatcher_send
 from homeassistant.helpers.event import async_track_time_interval
-from homeassistant.exceptions import ConfigEntryNotReady
+from homeassistant.core import callback
+from homeassistant.exceptions import ConfigEntryNotReady, HomeAssistantError
 
 from .const import (
+    ATTR_COLOR,
+    ATTR_COLORS,
+    ATTR_DEVICE,
+    ATTR_END,
     ATTR_PROFILE,
+    ATTR_RANGES,
+    ATTR_START,
+    ATTR_ZONE,
     CONF_ADD_LEDS,
+    CONF_COLOR_CORRECTION,
+    CONF_DDP_HOST,
+    CONF_DDP_MAPPING,
+    CONF_DDP_PORT,
+    CONF_RATE_LIMITS,
     CONFIG_VERSION,
     DEFAULT_ADD_LEDS,
     DEFAULT_CLIENT_ID,
+    DEFAULT_COLOR_CORRECTION,
+    DEFAULT_DDP_HOST,
+    DEFAULT_DDP_MAPPING,
+    DEFAULT_DDP_PORT,
     DEFAULT_PORT,
+    DEFAULT_RATE_LIMITS,
     DOMAIN,
     ENTRY_IS_SETUP,
     ORGB_DATA,
     ORGB_DISCOVERY_NEW,
+    ORGB_FILTER,
+    ORGB_LISTENER,
+    ORGB_PROBE,
+    ORGB_SCHEDULER,
+    ORGB_STATE_CACHE,
+    ORGB_TOPOLOGY,
     ORGB_TRACKER,
+    ORGB_WRITER,
+    PROBE_INTERVAL,
     SERVICE_FORCE_UPDATE,
     SERVICE_PULL_DEVICES,
     SERVICE_LOAD_PROFILE,
+    SERVICE_SET_LEDS,
     SIGNAL_DELETE_ENTITY,
+    SIGNAL_UPDATE_DEVICE,
     SIGNAL_UPDATE_ENTITY,
+    SIGNAL_UPDATE_PROFILES,
     TRACK_INTERVAL,
 )
-from .helpers import orgb_entity_id
+from .correction import orgb_corrections
+from .filters import DeviceFilter, orgb_filter
+from .helpers import orgb_entity_id, orgb_unique_id
+from .ratelimit import RATE_LIMIT_SCHEMA
+from .state import DeviceStateCache
+from .topology import TopologyTracker
+from .transition import FrameScheduler
+from .udp import DDPListener
+from .writer import DeviceWriter
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -52,6 +90,26 @@ CONFIG_SCHEMA = vol.Schema(
     extra=vol.ALLOW_EXTRA,
 )
 
+RGB_COLOR = vol.All(vol.Coerce(tuple), vol.ExactSequence((cv.byte,) * 3))
+
+SET_LEDS_SCHEMA = vol.Schema(
+    vol.All(
+        {
+            vol.Required(ATTR_DEVICE): cv.string,
+            vol.Optional(ATTR_ZONE): cv.string,
+            vol.Exclusive(ATTR_RANGES, "leds"): [
+                {
+                    vol.Required(ATTR_START): cv.positive_int,
+                    vol.Optional(ATTR_END): cv.positive_int,
+                    vol.Required(ATTR_COLOR): RGB_COLOR,
+                }
+            ],
+            vol.Exclusive(ATTR_COLORS, "leds"): [RGB_COLOR],
+        },
+        cv.has_at_least_one_key(ATTR_RANGES, ATTR_COLORS),
+    )
+)
+
 def autolog(message):
     "Automatically log the current function details."
     import inspect
@@ -137,8 +195,8 @@ async def async_setup_entry(hass, entry):
                 config[CONF_PORT],
             )
 
-        hass.data[DOMAIN][entry.entry_id]["online"] = True
-        dispatcher_send(hass, SIGNAL_UPDATE_ENTITY)
+            hass.data[DOMAIN][entry.entry_id]["online"] = True
+            dispatcher_send(hass, SIGNAL_UPDATE_ENTITY)
         autolog(">>>")
 
     def connection_failed():
@@ -151,20 +209,50 @@ async def async_setup_entry(hass, entry):
                 config[CONF_PORT],
             )
 
-        hass.data[DOMAIN][entry.entry_id]["online"] = False
-        dispatcher_send(hass, SIGNAL_UPDATE_ENTITY)
+            # Only tell the entities once, not on every failed reconnection
+            hass.data[DOMAIN][entry.entry_id]["online"] = False
+            dispatcher_send(hass, SIGNAL_UPDATE_ENTITY)
         autolog(">>>")
 
+    try:
+        corrections = orgb_corrections(
+            config.get(CONF_COLOR_CORRECTION, DEFAULT_COLOR_CORRECTION)
+        )
+    except vol.Invalid as err:
+        _LOGGER.error("Invalid color correction, ignoring it. Error: %s", err)
+        corrections = {}
+
+    try:
+        rate_limits = RATE_LIMIT_SCHEMA(config.get(CONF_RATE_LIMITS, DEFAULT_RATE_LIMITS))
+    except vol.Invalid as err:
+        _LOGGER.error("Invalid rate limits, using the default ones. Error: %s", err)
+        rate_limits = DEFAULT_RATE_LIMITS
+
+    try:
+        device_filter = orgb_filter(config)
+    except vol.Invalid as err:
+        _LOGGER.error("Invalid device filters, ignoring them. Error: %s", err)
+        device_filter = DeviceFilter([], [], config.get(CONF_ADD_LEDS, DEFAULT_ADD_LEDS), [])
+
     hass.data.setdefault(DOMAIN, {})
     hass.data[DOMAIN][entry.entry_id] = {
         "ha_dev_unique_id": f'{DOMAIN}_{entry.data[CONF_HOST]}_{entry.data[CONF_PORT]}',
         "online": True,
         ORGB_DATA: orgb,
         ORGB_TRACKER: None,
+        ORGB_PROBE: None,
+        ORGB_STATE_CACHE: DeviceStateCache(),
+        ORGB_TOPOLOGY: TopologyTracker(),
+        ORGB_WRITER: DeviceWriter(hass, entry.entry_id, corrections, rate_limits),
+        ORGB_SCHEDULER: FrameScheduler(hass, entry.entry_id),
+        ORGB_LISTENER: None,
+        ORGB_FILTER: device_filter,
         ENTRY_IS_SETUP: set(),
         "entities": {},
         "pending": {},
         "devices": {},
+        "profiles": [],
+        "active_profile": None,
         "unlistener": undo_listener,
         "connection_failed": connection_failed,
         "connection_recovered": connection_recovered,
@@ -183,10 +271,7 @@ async def async_setup_entry(hass, entry):
             device_type_list[ha_type].append(device)
 
             entity_id = orgb_entity_id(device)
-            device_unique_id = device.metadata.serial
-            # Some devices don't have a serial defined, so fall back to OpenRGB id
-            if not device_unique_id:
-                device_unique_id = entity_id
+            device_unique_id = orgb_unique_id(device)
 
             if entity_id not in hass.data[DOMAIN][entry.entry_id]["devices"]:
                 hass.data[DOMAIN][entry.entry_id]["devices"][entity_id] = []
@@ -195,7 +280,7 @@ async def async_setup_entry(hass, entry):
             if device_unique_id not in hass.data[DOMAIN][entry.entry_id]["entities"]:
                 hass.data[DOMAIN][entry.entry_id]["entities"][device_unique_id] = None
             
-            if CONF_ADD_LEDS in config and config[CONF_ADD_LEDS]:
+            if device_filter.add_leds(device):
                 # Stores each LED of the device as an entity
                 for led in device.leds:
                     led_unique_id = f"{device_unique_id}_led_{led.id}"
@@ -216,34 +301,137 @@ async def async_setup_entry(hass, entry):
 
         autolog(">>>")
 
+    def _settle_devices():
+        # Settle our optimistic writes against what the server reports,
+        # and pick up any change in the devices' layout
+        state_cache = hass.data[DOMAIN][entry.entry_id][ORGB_STATE_CACHE]
+        topology = hass.data[DOMAIN][entry.entry_id][ORGB_TOPOLOGY]
+        device_keys = set()
+        for device in _selected_devices():
+            device_key = orgb_unique_id(device)
+            device_keys.add(device_key)
+            topology.refresh(device_key, device)
+            state_cache.reconcile(device_key, device)
+        topology.retain(device_keys)
+        state_cache.retain(device_keys)
+
+    def _selected_devices():
+        return [
+            device
+            for device in orgb.devices
+            if device is not None and device_filter.selected(device)
+        ]
+
+    def _update_devices():
+        """Poll the server like orgb.update(), skipping filtered out devices."""
+        devices = orgb.devices
+        orgb.comms.requestDeviceNum()
+        # A new controller count has the client download every device anew
+        if orgb.devices is devices:
+            for index, device in enumerate(devices):
+                if device is None or device_filter.selected(device):
+                    orgb.comms.requestDeviceData(index)
+        if orgb.protocol_version >= 2:
+            orgb.update_profiles()
+
     def _get_updated_devices():
         autolog("<<<")
         if hass.data[DOMAIN][entry.entry_id]["online"]:
             try:
-                orgb.update()
-                return orgb.devices
+                _update_devices()
             except OSError:
                 autolog(">>>exception")
                 hass.data[DOMAIN][entry.entry_id]["connection_failed"]()
                 return None
+
+            _settle_devices()
+            devices = _selected_devices()
+            # Catch up with what was asked while the server was away
+            hass.data[DOMAIN][entry.entry_id][ORGB_WRITER].replay(devices)
+            return devices
         else:
             hass.data[DOMAIN][entry.entry_id]["connection_failed"]()
             autolog(">>>")
             return None
 
+    def _refresh_devices():
+        """Re-read the state of the known devices, and only that."""
+        try:
+            for device in _selected_devices():
+                device.update()
+        except OSError:
+            hass.data[DOMAIN][entry.entry_id]["connection_failed"]()
+            return False
+
+        _settle_devices()
+        return True
+
+    @callback
+    def async_update_profiles():
+        """Publish the profile list of the server, if it changed."""
+        profiles = [profile.name for profile in orgb.profiles]
+        if profiles != hass.data[DOMAIN][entry.entry_id]["profiles"]:
+            hass.data[DOMAIN][entry.entry_id]["profiles"] = profiles
+            async_dispatcher_send(hass, SIGNAL_UPDATE_PROFILES)
+
+    @callback
+    def async_remove_filtered_entities():
+        """Remove the entities the device filters now leave out."""
+        ha_dev_unique_id = hass.data[DOMAIN][entry.entry_id]["ha_dev_unique_id"]
+        filtered = {}
+        for device in orgb.devices:
+            if device is not None:
+                filtered[f"{ha_dev_unique_id}_{orgb_unique_id(device)}"] = (
+                    device_filter.selected(device),
+                    device_filter.add_leds(device),
+                )
+
+        entity_registry = er.async_get(hass)
+        for registry_entry in er.async_entries_for_config_entry(
+            entity_registry, entry.entry_id
+        ):
+            unique_id = registry_entry.unique_id
+            if unique_id in filtered:
+                # A device entity, whatever its name contains
+                if not filtered[unique_id][0]:
+                    entity_registry.async_remove(registry_entry.entity_id)
+                continue
+            device_id, is_led, _ = unique_id.rpartition("_led_")
+            if not is_led or device_id not in filtered:
+                continue
+            selected, add_leds = filtered[device_id]
+            if not selected or not add_leds:
+                entity_registry.async_remove(registry_entry.entity_id)
+
     device_list = await hass.async_add_executor_job(_get_updated_devices)
     _LOGGER.debug("hass device list: %s", device_list)
     if device_list is not None:
+        async_remove_filtered_entities()
         await async_load_devices(device_list)
+        async_update_profiles()
+
+    if orgb.protocol_version >= 2:
+        # Profiles are only supported from protocol version 2
+        await hass.config_entries.async_forward_entry_setups(entry, ["select"])
+        hass.data[DOMAIN][entry.entry_id][ENTRY_IS_SETUP].add("select.openrgb")
+
+    # The poll and the connection probe never run at the same time
+    poll_lock = asyncio.Lock()
 
     async def async_poll_devices_update(event_time):
+        async with poll_lock:
+            await _async_poll_devices(event_time)
+
+    async def _async_poll_devices(event_time):
         autolog("<<<")
         _LOGGER.debug("hass data: %s", hass.data[DOMAIN])
 
         if not hass.data[DOMAIN][entry.entry_id]["online"]:
             # try to reconnect
             try:
-                hass.data[DOMAIN][entry.entry_id][ORGB_DATA].connect()
+                await hass.async_add_executor_job(
+                    hass.data[DOMAIN][entry.entry_id][ORGB_DATA].connect
+                )
                 hass.data[DOMAIN][entry.entry_id]["connection_recovered"]()
             except OSError:
                 hass.data[DOMAIN][entry.entry_id]["connection_failed"]()
@@ -254,6 +442,7 @@ async def async_setup_entry(hass, entry):
             return
 
         await async_load_devices(device_list)
+        async_update_profiles()
 
         _LOGGER.debug("hass data newlist: %s", device_list)
 
@@ -270,18 +459,68 @@ async def async_setup_entry(hass, entry):
 
                 hass.data[DOMAIN][entry.entry_id]["devices"].pop(dev_id)
             else:
-                async_dispatcher_send(hass, SIGNAL_UPDATE_ENTITY, dev_id)
-                
-                for led_id in hass.data[DOMAIN][entry.entry_id]["devices"][dev_id]:
-                    async_dispatcher_send(hass, SIGNAL_UPDATE_ENTITY, led_id)
+                async_signal_device(dev_id)
 
         autolog(">>>")
 
 
+    @callback
+    def async_signal_device(dev_id):
+        """Tell a device, and its LEDs, that new info is available."""
+        async_dispatcher_send(hass, SIGNAL_UPDATE_DEVICE.format(dev_id))
+
+        for led_id in hass.data[DOMAIN][entry.entry_id]["devices"][dev_id]:
+            async_dispatcher_send(hass, SIGNAL_UPDATE_DEVICE.format(led_id))
+
+    ddp_port = config.get(CONF_DDP_PORT, DEFAULT_DDP_PORT)
+    if ddp_port:
+        try:
+            _, listener = await hass.loop.create_datagram_endpoint(
+                lambda: DDPListener(
+                    hass,
+                    entry.entry_id,
+                    config.get(CONF_DDP_MAPPING, DEFAULT_DDP_MAPPING),
+                ),
+                local_addr=(config.get(CONF_DDP_HOST, DEFAULT_DDP_HOST), ddp_port),
+            )
+            hass.data[DOMAIN][entry.entry_id][ORGB_LISTENER] = listener
+        except (OSError, vol.Invalid) as err:
+            _LOGGER.error("Unable to listen for DDP frames on port %i. Error: %s", ddp_port, err)
+
     hass.data[DOMAIN][entry.entry_id][ORGB_TRACKER] = async_track_time_interval(
         hass, async_poll_devices_update, TRACK_INTERVAL
     )
 
+    def _probe_connection():
+        """Ask the server for its controller count, return the count or None."""
+        try:
+            orgb.comms.requestDeviceNum()
+        except OSError:
+            hass.data[DOMAIN][entry.entry_id]["connection_failed"]()
+            return None
+        return orgb.device_num
+
+    async def async_probe_connection(event_time):
+        """Check the connection between two polls, without any device data."""
+        if poll_lock.locked():
+            return
+        async with poll_lock:
+            if not hass.data[DOMAIN][entry.entry_id]["online"]:
+                # Reconnect now rather than at the next poll
+                await _async_poll_devices(event_time)
+                return
+
+            device_num = len(orgb.devices)
+            if await hass.async_add_executor_job(_probe_connection) is None:
+                return
+            if orgb.device_num != device_num:
+                # The controllers changed, the full poll picks them up
+                await _async_poll_devices(event_time)
+
+    hass.data[DOMAIN][entry.entry_id][ORGB_PROBE] = async_track_time_interval(
+        hass, async_probe_connection, PROBE_INTERVAL
+    )
+
     hass.services.async_register(
         DOMAIN, SERVICE_PULL_DEVICES, async_poll_devices_update
     )
@@ -292,9 +531,48 @@ async def async_setup_entry(hass, entry):
 
     hass.services.async_register(DOMAIN, SERVICE_FORCE_UPDATE, async_force_update)
 
+    def _load_profile(name):
+        # Nothing we were about to write may override the profile
+        for device in orgb.devices:
+            if device is None:
+                continue
+            hass.data[DOMAIN][entry.entry_id][ORGB_WRITER].discard(orgb_unique_id(device))
+            hass.data[DOMAIN][entry.entry_id][ORGB_SCHEDULER].cancel(device)
+
+        try:
+            orgb.load_profile(name)
+        except OSError:
+            hass.data[DOMAIN][entry.entry_id]["connection_failed"]()
+            return False
+
+        # The profile overrides whatever we wrote to the devices
+        state_cache = hass.data[DOMAIN][entry.entry_id][ORGB_STATE_CACHE]
+        for device in orgb.devices:
+            if device is not None:
+                state_cache.invalidate(orgb_unique_id(device))
+        return _refresh_devices()
+
+    async def async_load_profile_by_name(name):
+        """Load a profile in OpenRGB server, then refresh the devices."""
+        if not hass.data[DOMAIN][entry.entry_id]["online"]:
+            raise HomeAssistantError("OpenRGB SDK Server is offline")
+
+        try:
+            loaded = await hass.async_add_executor_job(_load_profile, name)
+        except ValueError as err:
+            raise HomeAssistantError(str(err)) from err
+
+        if loaded:
+            hass.data[DOMAIN][entry.entry_id]["active_profile"] = name
+            async_dispatcher_send(hass, SIGNAL_UPDATE_PROFILES)
+            for dev_id in list(hass.data[DOMAIN][entry.entry_id]["devices"]):
+                async_signal_device(dev_id)
+
+    hass.data[DOMAIN][entry.entry_id]["load_profile"] = async_load_profile_by_name
+
     async def async_load_profile(call):
         """Load profile in OpenRGB server."""
-        hass.data[DOMAIN][entry.entry_id][ORGB_DATA].load_profile(call.data[ATTR_PROFILE])
+        await async_load_profile_by_name(call.data[ATTR_PROFILE])
 
     hass.services.async_register(
         DOMAIN,
@@ -309,6 +587,79 @@ async def async_setup_entry(hass, entry):
         ),
     )
 
+    def _set_leds(device, colors, zone):
+        hass.data[DOMAIN][entry.entry_id][ORGB_SCHEDULER].cancel(device, colors)
+        hass.data[DOMAIN][entry.entry_id][ORGB_WRITER].set_colors(device, colors, zone)
+
+    async def async_set_leds(call):
+        """Set LEDs of a device in a single write."""
+        # Look for the device on every server, wherever the service came from
+        for entry_id, data in hass.data[DOMAIN].items():
+            if data[ORGB_DATA] is None:
+                continue
+            device = next(
+                (
+                    device
+                    for device in data[ORGB_DATA].devices
+                    if device is not None
+                    and data[ORGB_FILTER].selected(device)
+                    and call.data[ATTR_DEVICE] in (device.name, device.metadata.serial)
+                ),
+                None,
+            )
+            if device is not None:
+                break
+        else:
+            raise HomeAssistantError(f"Unknown OpenRGB device {call.data[ATTR_DEVICE]}")
+
+        capabilities = data[ORGB_TOPOLOGY].capabilities(orgb_unique_id(device), device)
+        first, last = 0, capabilities.led_count
+        zone = None
+        if ATTR_ZONE in call.data:
+            zone = capabilities.zones.get(call.data[ATTR_ZONE])
+            if zone is None:
+                raise HomeAssistantError(
+                    f"Unknown zone {call.data[ATTR_ZONE]} on {device.name}"
+                )
+            first, last = capabilities.zone_ranges[zone]
+
+        colors = {}
+        if ATTR_COLORS in call.data:
+            for offset, color in enumerate(call.data[ATTR_COLORS]):
+                colors[first + offset] = color
+        else:
+            for led_range in call.data[ATTR_RANGES]:
+                start = led_range[ATTR_START]
+                end = led_range.get(ATTR_END, start)
+                if end < start:
+                    raise HomeAssistantError(f"LED range {start}-{end} is empty")
+                for offset in range(start, end + 1):
+                    colors[first + offset] = led_range[ATTR_COLOR]
+        if not colors:
+            return
+        if max(colors) >= last:
+            raise HomeAssistantError(
+                f"{device.name} only has {last - first} LEDs there"
+            )
+        if (
+            data["online"]
+            and data[ORGB_WRITER].color_mode(device) != RGBUtils.ModeColors.PER_LED
+        ):
+            raise HomeAssistantError(
+                f"{device.name} is not in a mode with per LED colors"
+            )
+
+        await hass.async_add_executor_job(
+            hass.data[DOMAIN][entry_id]["set_leds"], device, colors, zone
+        )
+        async_dispatcher_send(hass, SIGNAL_UPDATE_DEVICE.format(orgb_entity_id(device)))
+
+    hass.data[DOMAIN][entry.entry_id]["set_leds"] = _set_leds
+
+    hass.services.async_register(
+        DOMAIN, SERVICE_SET_LEDS, async_set_leds, schema=SET_LEDS_SCHEMA
+    )
+
     return True
 
 async def _update_listener(hass, config_entry):
@@ -336,12 +687,20 @@ async def async_unload_entry(hass, entry):
         hass.data[DOMAIN][entry.entry_id][ENTRY_IS_SETUP] = set()
         hass.data[DOMAIN][entry.entry_id][ORGB_TRACKER]()
         hass.data[DOMAIN][entry.entry_id][ORGB_TRACKER] = None
+        hass.data[DOMAIN][entry.entry_id][ORGB_PROBE]()
+        hass.data[DOMAIN][entry.entry_id][ORGB_PROBE] = None
+        hass.data[DOMAIN][entry.entry_id][ORGB_SCHEDULER].async_stop()
+        hass.data[DOMAIN][entry.entry_id][ORGB_WRITER].async_stop()
+        if hass.data[DOMAIN][entry.entry_id][ORGB_LISTENER] is not None:
+            hass.data[DOMAIN][entry.entry_id][ORGB_LISTENER].close()
+            hass.data[DOMAIN][entry.entry_id][ORGB_LISTENER] = None
         hass.data[DOMAIN][entry.entry_id][ORGB_DATA].disconnect()
         hass.data[DOMAIN][entry.entry_id][ORGB_DATA] = None
         hass.data[DOMAIN][entry.entry_id]["unlistener"]()
         hass.services.async_remove(DOMAIN, SERVICE_FORCE_UPDATE)
         hass.services.async_remove(DOMAIN, SERVICE_PULL_DEVICES)
         hass.services.async_remove(DOMAIN, SERVICE_LOAD_PROFILE)
+        hass.services.async_remove(DOMAIN, SERVICE_SET_LEDS)
         hass.data[DOMAIN].pop(entry.entry_id)
 
     autolog(">>>")
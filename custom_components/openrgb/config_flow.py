@@ -9,12 +9,53 @@ import voluptuous as vol
 from homeassistant import config_entries, exceptions
 from homeassistant.const import CONF_CLIENT_ID, CONF_HOST, CONF_PORT
 from homeassistant.core import callback
-
-from .const import CONF_ADD_LEDS, CONFIG_VERSION, CONN_TIMEOUT, DEFAULT_ADD_LEDS, DEFAULT_CLIENT_ID, DEFAULT_PORT, DOMAIN
+from homeassistant.helpers import selector
+
+from .const import (
+    CONF_ADD_LEDS,
+    CONF_COLOR_CORRECTION,
+    CONF_DDP_HOST,
+    CONF_DDP_MAPPING,
+    CONF_DDP_PORT,
+    CONF_EXCLUDE,
+    CONF_GROUPS,
+    CONF_INCLUDE,
+    CONF_LED_COLORS,
+    CONF_LED_DEVICES,
+    CONF_LED_UPDATE_INTERVAL,
+    CONF_RATE_LIMITS,
+    CONFIG_VERSION,
+    CONN_TIMEOUT,
+    DEFAULT_ADD_LEDS,
+    DEFAULT_CLIENT_ID,
+    DEFAULT_COLOR_CORRECTION,
+    DEFAULT_DDP_HOST,
+    DEFAULT_DDP_MAPPING,
+    DEFAULT_DDP_PORT,
+    DEFAULT_EXCLUDE,
+    DEFAULT_GROUPS,
+    DEFAULT_INCLUDE,
+    DEFAULT_LED_COLORS,
+    DEFAULT_LED_DEVICES,
+    DEFAULT_LED_UPDATE_INTERVAL,
+    DEFAULT_PORT,
+    DEFAULT_RATE_LIMITS,
+    DOMAIN,
+)
+from .correction import CORRECTION_SCHEMA
+from .filters import FILTER_SCHEMA
+from .group import GROUP_SCHEMA
+from .ratelimit import RATE_LIMIT_SCHEMA
+from .udp import MAPPING_SCHEMA
 
 _LOGGER = logging.getLogger(__name__)
 
 RESULT_CONN_ERROR = "cannot_connect"
+RESULT_INVALID_CORRECTION = "invalid_color_correction"
+RESULT_INVALID_MAPPING = "invalid_ddp_mapping"
+RESULT_INVALID_RATE_LIMITS = "invalid_rate_limits"
+RESULT_INVALID_GROUPS = "invalid_groups"
+RESULT_INVALID_FILTERS = "invalid_filters"
 RESULT_LOG_MESSAGE = {RESULT_CONN_ERROR: "Connection error"}
 
 
@@ -120,6 +161,17 @@ class OpenRGBOptionsFlowHandler(config_entries.OptionsFlow):
         self._port = config_entry.data[CONF_PORT] if CONF_PORT in config_entry.data else DEFAULT_PORT
         self._client_id = config_entry.data[CONF_CLIENT_ID] if CONF_CLIENT_ID in config_entry.data else DEFAULT_CLIENT_ID
         self._add_leds = config_entry.data[CONF_ADD_LEDS] if CONF_ADD_LEDS in config_entry.data else DEFAULT_ADD_LEDS
+        self._color_correction = config_entry.data[CONF_COLOR_CORRECTION] if CONF_COLOR_CORRECTION in config_entry.data else DEFAULT_COLOR_CORRECTION
+        self._ddp_host = config_entry.data[CONF_DDP_HOST] if CONF_DDP_HOST in config_entry.data else DEFAULT_DDP_HOST
+        self._ddp_port = config_entry.data[CONF_DDP_PORT] if CONF_DDP_PORT in config_entry.data else DEFAULT_DDP_PORT
+        self._ddp_mapping = config_entry.data[CONF_DDP_MAPPING] if CONF_DDP_MAPPING in config_entry.data else DEFAULT_DDP_MAPPING
+        self._rate_limits = config_entry.data[CONF_RATE_LIMITS] if CONF_RATE_LIMITS in config_entry.data else DEFAULT_RATE_LIMITS
+        self._groups = config_entry.data[CONF_GROUPS] if CONF_GROUPS in config_entry.data else DEFAULT_GROUPS
+        self._include = config_entry.data[CONF_INCLUDE] if CONF_INCLUDE in config_entry.data else DEFAULT_INCLUDE
+        self._exclude = config_entry.data[CONF_EXCLUDE] if CONF_EXCLUDE in config_entry.data else DEFAULT_EXCLUDE
+        self._led_devices = config_entry.data[CONF_LED_DEVICES] if CONF_LED_DEVICES in config_entry.data else DEFAULT_LED_DEVICES
+        self._led_update_interval = config_entry.data[CONF_LED_UPDATE_INTERVAL] if CONF_LED_UPDATE_INTERVAL in config_entry.data else DEFAULT_LED_UPDATE_INTERVAL
+        self._led_colors = config_entry.data[CONF_LED_COLORS] if CONF_LED_COLORS in config_entry.data else DEFAULT_LED_COLORS
 
     async def async_step_init(self, user_input=None):
         """Manage the options."""
@@ -133,15 +185,65 @@ class OpenRGBOptionsFlowHandler(config_entries.OptionsFlow):
             self._port = user_input[CONF_PORT]
             self._client_id = user_input[CONF_CLIENT_ID]
             self._add_leds = user_input[CONF_ADD_LEDS]
+            self._color_correction = user_input.get(CONF_COLOR_CORRECTION, DEFAULT_COLOR_CORRECTION)
+            self._ddp_host = user_input.get(CONF_DDP_HOST, DEFAULT_DDP_HOST)
+            self._ddp_port = user_input.get(CONF_DDP_PORT, DEFAULT_DDP_PORT)
+            self._ddp_mapping = user_input.get(CONF_DDP_MAPPING, DEFAULT_DDP_MAPPING)
+            self._rate_limits = user_input.get(CONF_RATE_LIMITS, DEFAULT_RATE_LIMITS)
+            self._groups = user_input.get(CONF_GROUPS, DEFAULT_GROUPS)
+            self._include = user_input.get(CONF_INCLUDE, DEFAULT_INCLUDE)
+            self._exclude = user_input.get(CONF_EXCLUDE, DEFAULT_EXCLUDE)
+            self._led_devices = user_input.get(CONF_LED_DEVICES, DEFAULT_LED_DEVICES)
+            self._led_update_interval = user_input.get(CONF_LED_UPDATE_INTERVAL, DEFAULT_LED_UPDATE_INTERVAL)
+            self._led_colors = user_input.get(CONF_LED_COLORS, DEFAULT_LED_COLORS)
 
         data_schema = {
             vol.Required(CONF_HOST, default=self._host): str,
             vol.Required(CONF_PORT, default=self._port): int,
             vol.Required(CONF_CLIENT_ID, default=self._client_id): str,
             vol.Required(CONF_ADD_LEDS, default=self._add_leds): bool,
+            vol.Optional(CONF_COLOR_CORRECTION, default=self._color_correction): selector.ObjectSelector(),
+            vol.Optional(CONF_DDP_HOST, default=self._ddp_host): str,
+            vol.Optional(CONF_DDP_PORT, default=self._ddp_port): vol.All(int, vol.Range(min=0, max=65535)),
+            vol.Optional(CONF_DDP_MAPPING, default=self._ddp_mapping): selector.ObjectSelector(),
+            vol.Optional(CONF_RATE_LIMITS, default=self._rate_limits): selector.ObjectSelector(),
+            vol.Optional(CONF_GROUPS, default=self._groups): selector.ObjectSelector(),
+            vol.Optional(CONF_INCLUDE, default=self._include): selector.ObjectSelector(),
+            vol.Optional(CONF_EXCLUDE, default=self._exclude): selector.ObjectSelector(),
+            vol.Optional(CONF_LED_DEVICES, default=self._led_devices): selector.ObjectSelector(),
+            vol.Optional(CONF_LED_UPDATE_INTERVAL, default=self._led_update_interval): vol.All(int, vol.Range(min=0)),
+            vol.Optional(CONF_LED_COLORS, default=self._led_colors): bool,
         }
 
         if user_input is not None:
+            try:
+                CORRECTION_SCHEMA(self._color_correction)
+            except vol.Invalid:
+                self._errors["base"] = RESULT_INVALID_CORRECTION
+            try:
+                MAPPING_SCHEMA(self._ddp_mapping)
+            except vol.Invalid:
+                self._errors["base"] = RESULT_INVALID_MAPPING
+            try:
+                RATE_LIMIT_SCHEMA(self._rate_limits)
+            except vol.Invalid:
+                self._errors["base"] = RESULT_INVALID_RATE_LIMITS
+            try:
+                GROUP_SCHEMA(self._groups)
+            except vol.Invalid:
+                self._errors["base"] = RESULT_INVALID_GROUPS
+            try:
+                for names in (self._include, self._exclude, self._led_devices):
+                    FILTER_SCHEMA(names)
+            except vol.Invalid:
+                self._errors["base"] = RESULT_INVALID_FILTERS
+            if self._errors:
+                return self.async_show_form(
+                    step_id="user",
+                    data_schema=vol.Schema(data_schema),
+                    errors=self._errors,
+                )
+
             try:
                 await asyncio.wait_for(
                     self.hass.async_add_executor_job(_try_connect, self._host, self._port, self._client_id),
@@ -155,6 +257,17 @@ class OpenRGBOptionsFlowHandler(config_entries.OptionsFlow):
                         CONF_PORT: self._port,
                         CONF_CLIENT_ID: self._client_id,
                         CONF_ADD_LEDS: self._add_leds,
+                        CONF_COLOR_CORRECTION: self._color_correction,
+                        CONF_DDP_HOST: self._ddp_host,
+                        CONF_DDP_PORT: self._ddp_port,
+                        CONF_DDP_MAPPING: self._ddp_mapping,
+                        CONF_RATE_LIMITS: self._rate_limits,
+                        CONF_GROUPS: self._groups,
+                        CONF_INCLUDE: self._include,
+                        CONF_EXCLUDE: self._exclude,
+                        CONF_LED_DEVICES: self._led_devices,
+                        CONF_LED_UPDATE_INTERVAL: self._led_update_interval,
+                        CONF_LED_COLORS: self._led_colors,
                     },
                 )
 
@@ -7,29 +7,88 @@ CONFIG_VERSION = 2
 
 ORGB_DATA = "openrgb_data"
 ORGB_TRACKER = "openrgb_tracker"
+ORGB_PROBE = "openrgb_probe"
+ORGB_STATE_CACHE = "openrgb_state_cache"
+ORGB_TOPOLOGY = "openrgb_topology"
+ORGB_WRITER = "openrgb_writer"
+ORGB_SCHEDULER = "openrgb_scheduler"
+ORGB_LISTENER = "openrgb_listener"
+ORGB_FILTER = "openrgb_filter"
 ORGB_DISCOVERY_NEW = "openrgb_discovery_new_{}"
 
 SERVICE_FORCE_UPDATE = "force_update"
 SERVICE_PULL_DEVICES = "pull_devices"
 SERVICE_LOAD_PROFILE = "load_profile"
+SERVICE_SET_LEDS = "set_leds"
 
 ATTR_PROFILE = "profile"
+ATTR_DEVICE = "device"
+ATTR_ZONE = "zone"
+ATTR_RANGES = "ranges"
+ATTR_COLORS = "colors"
+ATTR_COLOR = "color"
+ATTR_START = "start"
+ATTR_END = "end"
+ATTR_SUPPRESSED_WRITES = "suppressed_writes"
+ATTR_LED_COLORS = "led_colors"
 
 ENTRY_IS_SETUP = "openrgb_entry_is_setup"
 
 SIGNAL_DELETE_ENTITY = "openrgb_delete"
 SIGNAL_UPDATE_ENTITY = "openrgb_update"
+SIGNAL_UPDATE_DEVICE = "openrgb_update_{}"
+SIGNAL_UPDATE_PROFILES = "openrgb_update_profiles"
 
 TRACK_INTERVAL = timedelta(seconds=30)
+PROBE_INTERVAL = timedelta(seconds=5)
+FRAME_INTERVAL = timedelta(milliseconds=50)
+# Unconfirmed writes stop shadowing the polled state after this many seconds
+STATE_CACHE_TTL = 2 * TRACK_INTERVAL.total_seconds()
 
 CONF_ADD_LEDS = "add_leds"
+CONF_COLOR_CORRECTION = "color_correction"
+CONF_GAMMA = "gamma"
+CONF_RED = "red"
+CONF_GREEN = "green"
+CONF_BLUE = "blue"
+CONF_DDP_HOST = "ddp_host"
+CONF_DDP_PORT = "ddp_port"
+CONF_DDP_MAPPING = "ddp_mapping"
+CONF_DEVICE = "device"
+CONF_ZONE = "zone"
+CONF_START = "start"
+CONF_RATE_LIMITS = "rate_limits"
+CONF_GROUPS = "groups"
+CONF_INCLUDE = "include"
+CONF_EXCLUDE = "exclude"
+CONF_LED_DEVICES = "led_devices"
+CONF_LED_UPDATE_INTERVAL = "led_update_interval"
+CONF_LED_COLORS = "led_colors_attribute"
 
 DEFAULT_PORT = 6742
 DEFAULT_CLIENT_ID = "Home Assistant"
 DEFAULT_ADD_LEDS = False
+DEFAULT_COLOR_CORRECTION = {}
+DEFAULT_DDP_HOST = "0.0.0.0"
+DEFAULT_DDP_PORT = 0
+DEFAULT_DDP_MAPPING = []
+# Updates per second, for controllers known to stall on SMBus
+DEFAULT_RATE_LIMITS = {"dram": 5.0, "motherboard": 10.0}
+DEFAULT_GROUPS = {}
+DEFAULT_INCLUDE = []
+DEFAULT_EXCLUDE = []
+DEFAULT_LED_DEVICES = []
+# Seconds between two poll updates of a LED entity, 0 to follow every poll
+DEFAULT_LED_UPDATE_INTERVAL = 0
+DEFAULT_LED_COLORS = False
+
+RATE_LIMIT_BURST = 2
 
 CONN_TIMEOUT = 5.0
 
+# Entities registered with Home Assistant in one go
+ENTITY_CHUNK_SIZE = 64
+
 EFFECT_DIRECT = "Direct"
 EFFECT_OFF = "Off"
 EFFECT_STATIC = "Static"
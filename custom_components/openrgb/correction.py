@@ -0,0 +1,61 @@
+"""Color correction for the OpenRGB Integration."""
+import voluptuous as vol
+
+import homeassistant.helpers.config_validation as cv
+
+from .const import CONF_BLUE, CONF_GAMMA, CONF_GREEN, CONF_RED
+
+_GAIN = vol.All(vol.Coerce(float), vol.Range(min=0.0, max=1.0))
+
+CORRECTION_SCHEMA = vol.Schema(
+    {
+        cv.string: vol.Schema(
+            {
+                vol.Optional(CONF_GAMMA, default=1.0): vol.All(
+                    vol.Coerce(float), vol.Range(min=0.1, max=5.0)
+                ),
+                vol.Optional(CONF_RED, default=1.0): _GAIN,
+                vol.Optional(CONF_GREEN, default=1.0): _GAIN,
+                vol.Optional(CONF_BLUE, default=1.0): _GAIN,
+            }
+        )
+    }
+)
+
+
+def _lookup_table(gamma, gain):
+    """Return a 256 entries table mapping a channel value to its corrected value."""
+    return bytes(
+        min(255, round(255.0 * gain * (value / 255.0) ** gamma))
+        for value in range(256)
+    )
+
+
+class ColorCorrection:
+    """Gamma and white balance correction of a device, as lookup tables."""
+
+    def __init__(self, gamma=1.0, red=1.0, green=1.0, blue=1.0):
+        """Compile the correction into one lookup table per channel."""
+        self._red = _lookup_table(gamma, red)
+        self._green = _lookup_table(gamma, green)
+        self._blue = _lookup_table(gamma, blue)
+
+    def apply(self, colors):
+        """Correct a list of (r, g, b) colors."""
+        raw = bytearray(channel for color in colors for channel in color)
+        self.apply_raw(raw)
+        return list(zip(raw[0::3], raw[1::3], raw[2::3]))
+
+    def apply_raw(self, raw, stride=3):
+        """Correct packed colors in place, each stride bytes starting with r, g, b."""
+        raw[0::stride] = raw[0::stride].translate(self._red)
+        raw[1::stride] = raw[1::stride].translate(self._green)
+        raw[2::stride] = raw[2::stride].translate(self._blue)
+
+
+def orgb_corrections(config):
+    """Compile the configured correction profiles, keyed by what they match."""
+    return {
+        match: ColorCorrection(**profile)
+        for match, profile in CORRECTION_SCHEMA(config).items()
+    }
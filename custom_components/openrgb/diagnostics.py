@@ -0,0 +1,40 @@
+"""Diagnostics support for the OpenRGB Integration."""
+from .const import (
+    DOMAIN,
+    ORGB_DATA,
+    ORGB_LISTENER,
+    ORGB_SCHEDULER,
+    ORGB_STATE_CACHE,
+    ORGB_WRITER,
+)
+from .helpers import orgb_unique_id
+
+
+async def async_get_config_entry_diagnostics(hass, entry):
+    """Return diagnostics for a config entry."""
+    data = hass.data[DOMAIN][entry.entry_id]
+    state_cache = data[ORGB_STATE_CACHE]
+    listener = data[ORGB_LISTENER]
+
+    diagnostics = {
+        "online": data["online"],
+        "devices": {
+            device.name: {
+                "suppressed_writes": state_cache.suppressed_writes(orgb_unique_id(device)),
+            }
+            for device in data[ORGB_DATA].devices
+            if device is not None
+        },
+        "merged_writes": data[ORGB_WRITER].merged_writes,
+        "queued_writes": data[ORGB_WRITER].queued_writes,
+        "transitions": {
+            "skipped_frames": data[ORGB_SCHEDULER].skipped_frames,
+        },
+    }
+    if listener is not None:
+        diagnostics["ddp"] = {
+            "frames": listener.frames,
+            "dropped_frames": listener.dropped_frames,
+            "late_frames": listener.late_frames,
+        }
+    return diagnostics
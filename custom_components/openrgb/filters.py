@@ -0,0 +1,55 @@
+"""Device filters for the OpenRGB Integration."""
+import voluptuous as vol
+
+import homeassistant.helpers.config_validation as cv
+
+from .const import (
+    CONF_ADD_LEDS,
+    CONF_EXCLUDE,
+    CONF_INCLUDE,
+    CONF_LED_DEVICES,
+    DEFAULT_ADD_LEDS,
+    DEFAULT_EXCLUDE,
+    DEFAULT_INCLUDE,
+    DEFAULT_LED_DEVICES,
+)
+from .helpers import orgb_listed
+
+FILTER_SCHEMA = vol.Schema(vol.All(cv.ensure_list, [cv.string]))
+
+
+class DeviceFilter:
+    """Pick the devices to poll and expose, and those getting LED entities.
+
+    Devices are listed by serial, name, type or vendor. An empty include
+    list includes every device, and exclusions win over inclusions. LED
+    entities are added for every device with add_leds, else only for the
+    listed ones.
+    """
+
+    def __init__(self, include, exclude, add_leds, led_devices):
+        """Initialize the filter from validated lists."""
+        self._include = set(include)
+        self._exclude = set(exclude)
+        self._add_leds = add_leds
+        self._led_devices = set(led_devices)
+
+    def selected(self, device):
+        """Return whether a device is polled and exposed."""
+        if orgb_listed(self._exclude, device):
+            return False
+        return not self._include or orgb_listed(self._include, device)
+
+    def add_leds(self, device):
+        """Return whether each LED of a device gets its own entity."""
+        return self._add_leds or orgb_listed(self._led_devices, device)
+
+
+def orgb_filter(config):
+    """Build the device filter of an entry, raise vol.Invalid on bad lists."""
+    return DeviceFilter(
+        FILTER_SCHEMA(config.get(CONF_INCLUDE, DEFAULT_INCLUDE)),
+        FILTER_SCHEMA(config.get(CONF_EXCLUDE, DEFAULT_EXCLUDE)),
+        config.get(CONF_ADD_LEDS, DEFAULT_ADD_LEDS),
+        FILTER_SCHEMA(config.get(CONF_LED_DEVICES, DEFAULT_LED_DEVICES)),
+    )
@@ -0,0 +1,336 @@
+"""Synchronized light groups for the OpenRGB Integration."""
+import asyncio
+import logging
+
+import voluptuous as vol
+
+from homeassistant.components.light import (
+    ATTR_BRIGHTNESS,
+    ATTR_EFFECT,
+    ATTR_HS_COLOR,
+    ATTR_TRANSITION,
+    DOMAIN as LIGHT_DOMAIN,
+    ColorMode,
+    LightEntity,
+    LightEntityFeature,
+)
+from homeassistant.core import callback
+import homeassistant.helpers.config_validation as cv
+from homeassistant.helpers.dispatcher import (
+    async_dispatcher_connect,
+    async_dispatcher_send,
+)
+from homeassistant.util import slugify
+import homeassistant.util.color as color_util
+
+from .const import (
+    DOMAIN,
+    EFFECT_DIRECT,
+    EFFECT_OFF,
+    EFFECT_STATIC,
+    ORGB_DATA,
+    ORGB_DISCOVERY_NEW,
+    ORGB_FILTER,
+    ORGB_SCHEDULER,
+    ORGB_STATE_CACHE,
+    ORGB_TOPOLOGY,
+    ORGB_WRITER,
+    SIGNAL_UPDATE_DEVICE,
+    SIGNAL_UPDATE_ENTITY,
+)
+from .helpers import orgb_entity_id, orgb_unique_id
+
+_LOGGER = logging.getLogger(__name__)
+
+GROUP_SCHEMA = vol.Schema({cv.string: vol.All(cv.ensure_list, [cv.string])})
+
+
+class OpenRGBGroup(LightEntity):
+    """Representation of OpenRGB Devices changed together.
+
+    Members are matched by name or serial on every OpenRGB server. A command
+    writes to each server from its own executor job, all of them at once,
+    and to the members of a server back to back, colors after modes, so
+    that the whole group changes within one frame. Members on a server that
+    is offline are kept, so that their writes get queued until it is back.
+
+    The member list is looked up again on global updates and once per poll,
+    and the group only refreshes on the update signals of its members.
+    """
+
+    _attr_should_poll = False
+
+    def __init__(self, ha_dev_unique_id, entry_id, name, members):
+        """Initialize an OpenRGB group."""
+        self._entry_id = entry_id
+        self._members = members
+        self._callbacks = []
+        self._member_list = []
+        self._member_signals = {}
+        self._attr_unique_id = f"{ha_dev_unique_id}_group_{slugify(name)}"
+        self._attr_name = name
+
+        self._brightness = 255.0
+        self._prev_brightness = 255.0
+
+        self._hs_value = (0.0, 0.0)
+        self._prev_hs_value = (0.0, 0.0)
+
+        self._effect = None
+        self._effects = []
+
+        self._state = False
+
+    async def async_added_to_hass(self):
+        """Call when entity is added to hass."""
+        self._callbacks.append(
+            async_dispatcher_connect(
+                self.hass, SIGNAL_UPDATE_ENTITY, self._update_callback
+            )
+        )
+        self._callbacks.append(
+            async_dispatcher_connect(
+                self.hass,
+                ORGB_DISCOVERY_NEW.format(LIGHT_DOMAIN),
+                self._discovery_callback,
+            )
+        )
+        self._update_callback()
+
+    async def async_will_remove_from_hass(self):
+        """Cleanup signal handlers."""
+        for signal_callback in self._callbacks:
+            signal_callback()
+        for signal_callback in self._member_signals.values():
+            signal_callback()
+        self._member_signals = {}
+
+    @callback
+    def _async_refresh_members(self):
+        """Look the members up, and follow the update signals of their devices."""
+        self._member_list = self._member_devices()
+        signals = {
+            SIGNAL_UPDATE_DEVICE.format(orgb_entity_id(device))
+            for _, device in self._member_list
+        }
+        for signal in set(self._member_signals) - signals:
+            self._member_signals.pop(signal)()
+        for signal in signals - set(self._member_signals):
+            self._member_signals[signal] = async_dispatcher_connect(
+                self.hass, signal, self._member_callback
+            )
+        return signals
+
+    @callback
+    def _update_callback(self):
+        self._async_refresh_members()
+        self.async_schedule_update_ha_state(True)
+
+    @callback
+    def _discovery_callback(self, entry_id, devices):
+        """Pick up members appearing or leaving with a poll."""
+        previous = set(self._member_signals)
+        if self._async_refresh_members() != previous:
+            self.async_schedule_update_ha_state(True)
+
+    @callback
+    def _member_callback(self):
+        self.async_schedule_update_ha_state(True)
+
+    def _member_devices(self):
+        """Return the (entry id, device) of every member, online or not."""
+        members = []
+        for entry_id, data in self.hass.data[DOMAIN].items():
+            if data[ORGB_DATA] is None:
+                continue
+            for device in data[ORGB_DATA].devices:
+                # Skip the devices being downloaded again, and filtered out ones
+                if device is None or not data[ORGB_FILTER].selected(device):
+                    continue
+                if device.name in self._members or (
+                    device.metadata.serial and device.metadata.serial in self._members
+                ):
+                    members.append((entry_id, device))
+        return members
+
+    # Device Properties
+
+    @property
+    def icon(self):
+        """Give this group an icon."""
+        return "mdi:lightbulb-group"
+
+    @property
+    def available(self):
+        """Return if any member is known, as offline ones queue their writes."""
+        return bool(self._member_list)
+
+    @property
+    def is_on(self):
+        """Return true if the group is on."""
+        return self._state
+
+    @property
+    def brightness(self):
+        """Return the brightness of this group between 0..255."""
+        return self._brightness
+
+    @property
+    def color_mode(self):
+        """Return the color mode of the group."""
+        return ColorMode.HS
+
+    @property
+    def supported_color_modes(self):
+        """Return a set of supported color modes."""
+        return {ColorMode.HS}
+
+    @property
+    def hs_color(self):
+        """Return the hue and saturation color value [float, float]."""
+        return self._hs_value
+
+    @property
+    def effect_list(self):
+        """Return the effects every member supports."""
+        return self._effects
+
+    @property
+    def effect(self):
+        """Return the current effect."""
+        return self._effect
+
+    @property
+    def supported_features(self):
+        """Return the supported features for this group."""
+        return LightEntityFeature.EFFECT | LightEntityFeature.TRANSITION
+
+    @property
+    def extra_state_attributes(self):
+        """Return the group specific state attributes."""
+        return {"members": self._members}
+
+    # Public interfaces to control the group
+
+    async def async_turn_on(self, **kwargs):
+        """Turn the group on."""
+        transition = kwargs.pop(ATTR_TRANSITION, None)
+
+        if ATTR_HS_COLOR in kwargs:
+            self._hs_value = kwargs.get(ATTR_HS_COLOR)
+
+        if ATTR_BRIGHTNESS in kwargs:
+            self._brightness = kwargs.get(ATTR_BRIGHTNESS)
+
+        # Restore the state if the group just gets turned on
+        if not kwargs:
+            self._brightness = 255.0 if self._prev_brightness == 0.0 else self._prev_brightness
+            self._hs_value = self._prev_hs_value
+
+        color = color_util.color_hsv_to_RGB(
+            *(self._hs_value), 100.0 * (self._brightness / 255.0)
+        )
+        await self._async_fan_out(color, transition, effect=kwargs.get(ATTR_EFFECT))
+        self._state = True
+
+    async def async_turn_off(self, **kwargs):
+        """Turn the group off."""
+        if not self.is_on:
+            return
+
+        self._prev_brightness = self._brightness
+        self._prev_hs_value = self._hs_value
+
+        await self._async_fan_out((0, 0, 0), kwargs.get(ATTR_TRANSITION), off=True)
+        self._state = False
+
+    async def _async_fan_out(self, color, transition, effect=None, off=False):
+        servers = {}
+        for entry_id, device in self._member_list:
+            servers.setdefault(entry_id, []).append(device)
+
+        await asyncio.gather(
+            *(
+                self.hass.async_add_executor_job(
+                    self._write_server, entry_id, devices, color, transition, effect, off
+                )
+                for entry_id, devices in servers.items()
+            )
+        )
+
+        # Let the member entities, and only them, pick up the new state
+        for _, device in self._member_list:
+            async_dispatcher_send(
+                self.hass, SIGNAL_UPDATE_DEVICE.format(orgb_entity_id(device))
+            )
+
+    def _write_server(self, entry_id, devices, color, transition, effect, off):
+        """Write to the members on one server."""
+        data = self.hass.data[DOMAIN][entry_id]
+        writer = data[ORGB_WRITER]
+        scheduler = data[ORGB_SCHEDULER]
+
+        # Modes go first, as the server answers each of them
+        colored = []
+        for device in devices:
+            key = orgb_unique_id(device)
+            capabilities = data[ORGB_TOPOLOGY].capabilities(key, device)
+            if off:
+                if capabilities.supports_off and not transition:
+                    scheduler.cancel(device)
+                    writer.set_mode(device, EFFECT_OFF)
+                    continue
+            elif effect in capabilities.modes:
+                writer.set_mode(device, effect)
+            elif data[ORGB_STATE_CACHE].mode(key, device) == EFFECT_OFF:
+                if capabilities.supports_static:
+                    writer.set_mode(device, EFFECT_STATIC)
+                elif capabilities.supports_direct:
+                    writer.set_mode(device, EFFECT_DIRECT)
+            colored.append((device, capabilities.led_count))
+
+        # Then the colors, back to back without waiting for the server
+        for device, led_count in colored:
+            if not led_count:
+                continue
+            colors = dict.fromkeys(range(led_count), color)
+            if transition and data["online"]:
+                scheduler.start(device, colors, transition)
+            else:
+                scheduler.cancel(device, colors)
+                writer.set_colors(device, colors)
+
+    def update(self):
+        """Update the group state from its first member."""
+        members = self._member_list
+        if not members:
+            return
+
+        effects = None
+        modes = []
+        for entry_id, device in members:
+            data = self.hass.data[DOMAIN][entry_id]
+            key = orgb_unique_id(device)
+            capabilities = data[ORGB_TOPOLOGY].capabilities(key, device)
+            effects = (
+                set(capabilities.effects)
+                if effects is None
+                else effects & set(capabilities.effects)
+            )
+            modes.append(data[ORGB_STATE_CACHE].mode(key, device))
+        self._effects = sorted(effects)
+
+        entry_id, device = members[0]
+        hsv_color = color_util.color_RGB_to_hsv(
+            *self.hass.data[DOMAIN][entry_id][ORGB_STATE_CACHE].color(
+                orgb_unique_id(device), device, 0
+            )
+        )
+        self._hs_value = (hsv_color[0], hsv_color[1])
+        self._brightness = 255.0 * (hsv_color[2] / 100.0)
+        self._effect = modes[0]
+
+        # Infer the state the same way the members do
+        self._state = self._brightness > 0.0 and any(
+            mode != EFFECT_OFF for mode in modes
+        )
@@ -20,20 +20,52 @@ def orgb_entity_id(instance):
     return ENTITY_ID_FORMAT.format(orgb_object_id(instance))
 
 
+def orgb_unique_id(instance):
+    """Return the ORGB devices unique ID."""
+    # Some devices don't have a serial defined, so fall back to OpenRGB id
+    return instance.metadata.serial or orgb_entity_id(instance)
+
+
+def orgb_keys(instance):
+    """Return what an ORGB device can be referred to by, most specific first."""
+    return (
+        instance.metadata.serial,
+        instance.name,
+        instance.type.name.lower(),
+        instance.metadata.vendor,
+    )
+
+
+def orgb_match(mapping, instance):
+    """Return the mapping value for a device, by serial, name, type or vendor."""
+    if not mapping:
+        return None
+    for match in orgb_keys(instance):
+        if match and match in mapping:
+            return mapping[match]
+    return None
+
+
+def orgb_listed(names, instance):
+    """Return whether a device is listed by serial, name, type or vendor."""
+    return any(match and match in names for match in orgb_keys(instance))
+
+
+ICONS = {
+    DeviceType.MOTHERBOARD: "view-dashboard-outline",
+    DeviceType.DRAM: "memory",
+    DeviceType.GPU: "expansion-card",
+    DeviceType.COOLER: "fan",
+    DeviceType.LEDSTRIP: "led-outline",
+    DeviceType.KEYBOARD: "keyboard",
+    DeviceType.MOUSE: "mouse",
+    DeviceType.MOUSEMAT: "rug",
+    DeviceType.HEADSET: "headset",
+    DeviceType.HEADSET_STAND: "headset-dock",
+    DeviceType.UNKNOWN: "crosshairs-question",
+}
+
+
 def orgb_icon(device_type):
     """Return a suitable icon for this device_type."""
-    icons = {
-        DeviceType.MOTHERBOARD: "view-dashboard-outline",
-        DeviceType.DRAM: "memory",
-        DeviceType.GPU: "expansion-card",
-        DeviceType.COOLER: "fan",
-        DeviceType.LEDSTRIP: "led-outline",
-        DeviceType.KEYBOARD: "keyboard",
-        DeviceType.MOUSE: "mouse",
-        DeviceType.MOUSEMAT: "rug",
-        DeviceType.HEADSET: "headset",
-        DeviceType.HEADSET_STAND: "headset-dock",
-        DeviceType.UNKNOWN: "crosshairs-question",
-    }
-
-    return icons.get(device_type, "lightbulb")
+    return ICONS.get(device_type, "lightbulb")
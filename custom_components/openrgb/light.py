@@ -1,14 +1,18 @@
 """Platform for OpenRGB Integration."""
+import asyncio
 import logging
+import time
 
-from openrgb import utils as RGBUtils
+import voluptuous as vol
 
 # Import the device class from the component that you want to support
 from homeassistant.components.light import (
     ATTR_BRIGHTNESS,
     ATTR_EFFECT,
     ATTR_HS_COLOR,
+    ATTR_TRANSITION,
     DOMAIN as SENSOR_DOMAIN,
+    ENTITY_ID_FORMAT,
     ColorMode,
     LightEntityFeature,
     LightEntity,
@@ -19,16 +23,31 @@ from homeassistant.helpers import entity_registry as er
 import homeassistant.util.color as color_util
 
 from .const import (
-    CONF_ADD_LEDS,
+    ATTR_LED_COLORS,
+    ATTR_SUPPRESSED_WRITES,
+    CONF_GROUPS,
+    CONF_LED_COLORS,
+    CONF_LED_UPDATE_INTERVAL,
+    DEFAULT_GROUPS,
+    DEFAULT_LED_COLORS,
+    DEFAULT_LED_UPDATE_INTERVAL,
     DOMAIN,
+    ENTITY_CHUNK_SIZE,
     EFFECT_DIRECT,
     EFFECT_OFF,
     EFFECT_STATIC,
     ORGB_DISCOVERY_NEW,
+    ORGB_FILTER,
+    ORGB_SCHEDULER,
+    ORGB_STATE_CACHE,
+    ORGB_TOPOLOGY,
+    ORGB_WRITER,
     SIGNAL_DELETE_ENTITY,
+    SIGNAL_UPDATE_DEVICE,
     SIGNAL_UPDATE_ENTITY,
 )
-from .helpers import orgb_entity_id, orgb_icon, orgb_object_id, orgb_tuple
+from .group import GROUP_SCHEMA, OpenRGBGroup
+from .helpers import orgb_entity_id, orgb_icon, orgb_object_id, orgb_unique_id
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -45,9 +64,15 @@ async def async_setup_entry(hass, config_entry, async_add_entities):
             hass,
             config_entry.entry_id,
             dev_ids,
-            config_entry.data[CONF_ADD_LEDS] if CONF_ADD_LEDS in config_entry.data else False,
+            config_entry.data.get(CONF_LED_UPDATE_INTERVAL, DEFAULT_LED_UPDATE_INTERVAL),
+            config_entry.data.get(CONF_LED_COLORS, DEFAULT_LED_COLORS),
         )
-        async_add_entities(entities, True)
+        # The entities come seeded from the poll, so they need no update
+        # before being added; add them a chunk at a time to keep the event
+        # loop responsive with thousands of LEDs
+        for start in range(0, len(entities), ENTITY_CHUNK_SIZE):
+            async_add_entities(entities[start:start + ENTITY_CHUNK_SIZE])
+            await asyncio.sleep(0)
 
     async_dispatcher_connect(
         hass, ORGB_DISCOVERY_NEW.format(SENSOR_DOMAIN), async_discover_sensor
@@ -56,29 +81,59 @@ async def async_setup_entry(hass, config_entry, async_add_entities):
     device_ids = hass.data[DOMAIN][config_entry.entry_id]["pending"].pop(SENSOR_DOMAIN)
     await async_discover_sensor(config_entry.entry_id, device_ids)
 
+    try:
+        groups = GROUP_SCHEMA(config_entry.data.get(CONF_GROUPS, DEFAULT_GROUPS))
+    except vol.Invalid as err:
+        _LOGGER.error("Invalid light groups, ignoring them. Error: %s", err)
+        groups = {}
+
+    ha_dev_unique_id = hass.data[DOMAIN][config_entry.entry_id]["ha_dev_unique_id"]
+    async_add_entities(
+        [
+            OpenRGBGroup(ha_dev_unique_id, config_entry.entry_id, name, members)
+            for name, members in groups.items()
+        ],
+        True,
+    )
+
 
-def _setup_entities(hass, entry_id, dev_ids, add_leds):
+def _setup_entities(hass, entry_id, dev_ids, led_update_interval, led_colors):
     """Set up OpenRGB Light device."""
+    device_filter = hass.data[DOMAIN][entry_id][ORGB_FILTER]
     entities = []
     for dev_id in dev_ids:
         if dev_id is None:
             continue
 
-        entity_id = orgb_entity_id(dev_id)
         ha_dev_unique_id = hass.data[DOMAIN][entry_id]["ha_dev_unique_id"]
-        device_unique_id = dev_id.metadata.serial
-        # Some devices don't have a serial defined, so fall back to OpenRGB id
-        if not device_unique_id:
-            device_unique_id = entity_id
+        device_unique_id = orgb_unique_id(dev_id)
 
         if not hass.data[DOMAIN][entry_id]["entities"].get(device_unique_id, None):
-            entities.append(OpenRGBDevice(hass, ha_dev_unique_id, entry_id, dev_id, device_unique_id))
+            entities.append(
+                OpenRGBDevice(
+                    hass, ha_dev_unique_id, entry_id, dev_id, device_unique_id, led_colors
+                )
+            )
 
-        if add_leds:
+        if device_filter.add_leds(dev_id):
             for led in dev_id.leds:
                 led_unique_id = f"{device_unique_id}_led_{led.id}"
                 if not hass.data[DOMAIN][entry_id]["entities"].get(led_unique_id, None):
-                    entities.append(OpenRGBLed(hass, ha_dev_unique_id, entry_id, dev_id, led.id, led_unique_id))
+                    entities.append(
+                        OpenRGBLed(
+                            hass,
+                            ha_dev_unique_id,
+                            entry_id,
+                            dev_id,
+                            led.id,
+                            led_unique_id,
+                            led_update_interval,
+                        )
+                    )
+
+    # Seed the state from the poll that just ran, in this one executor job
+    for entity in entities:
+        entity.update()
     return entities
 
 class OpenRGBLight(LightEntity):
@@ -89,6 +144,8 @@ class OpenRGBLight(LightEntity):
         self._hass = hass
         self._ha_dev_id = ha_dev_id
         self._entry_id = entry_id
+        self._derived = None
+        self._derived_version = None
 
     async def async_added_to_hass(self):
         """Call when entity is added to hass."""
@@ -101,36 +158,75 @@ class OpenRGBLight(LightEntity):
 
     # Device Properties
 
+    def _derived_properties(self):
+        """Return the properties derived from the device, cached per topology version."""
+        version = self._hass.data[DOMAIN][self._entry_id][ORGB_TOPOLOGY].version(
+            self._device_key, self._light
+        )
+        if version != self._derived_version:
+            object_id = orgb_object_id(self._light)
+            self._derived = {
+                "object_id": object_id,
+                "device_entity_id": ENTITY_ID_FORMAT.format(object_id),
+                "device_info": {
+                    "identifiers": {
+                        (
+                            DOMAIN,
+                            f'{self._ha_dev_id}_{orgb_entity_id(self._light)}'
+                        )
+                    },
+                    "name": self._light.name,
+                    "manufacturer": self._light.metadata.vendor,
+                    "model": self._light.metadata.description,
+                    "sw_version": self._light.metadata.version,
+                },
+                "icon": "mdi:{}".format(orgb_icon(self._light.type)),
+                "name": self._retrieve_current_name(),
+            }
+            self._derived_version = version
+        return self._derived
+
     @property
     def object_id(self):
         """Return the OpenRGB id."""
-        return orgb_object_id(self._light)
-    
+        return self._derived_properties()["object_id"]
+
     @property
     def device_info(self):
-        return {
-            "identifiers": {
-                (
-                    DOMAIN, 
-                    f'{self._ha_dev_id}_{orgb_entity_id(self._light)}'
-                )
-            },
-            "name": self._light.name,
-            "manufacturer": self._light.metadata.vendor,
-            "model": self._light.metadata.description,
-            "sw_version": self._light.metadata.version,
-        }
+        return self._derived_properties()["device_info"]
 
     @property
     def icon(self):
         """Give this device an icon representing what it is."""
-        return "mdi:{}".format(orgb_icon(self._light.type))
+        return self._derived_properties()["icon"]
 
     @property
     def name(self):
         """Return the display name of the light."""
         return self._name
 
+    @property
+    def _state_cache(self):
+        """Return the optimistic state cache of this entry."""
+        return self._hass.data[DOMAIN][self._entry_id][ORGB_STATE_CACHE]
+
+    @property
+    def _writer(self):
+        """Return the device writer of this entry."""
+        return self._hass.data[DOMAIN][self._entry_id][ORGB_WRITER]
+
+    @property
+    def _scheduler(self):
+        """Return the transition scheduler of this entry."""
+        return self._hass.data[DOMAIN][self._entry_id][ORGB_SCHEDULER]
+
+    @property
+    def _capabilities(self):
+        """Return the capability index of the underlying device."""
+        return self._hass.data[DOMAIN][self._entry_id][ORGB_TOPOLOGY].capabilities(
+            self._device_key, self._light
+        )
+
     @property
     def available(self):
         """Return if the device is online."""
@@ -170,6 +266,8 @@ class OpenRGBLight(LightEntity):
 
     def turn_on(self, **kwargs):
         """Turn the device on, and set defaults."""
+        transition = kwargs.pop(ATTR_TRANSITION, None)
+
         if ATTR_HS_COLOR in kwargs:
             self._hs_value = kwargs.get(ATTR_HS_COLOR)
 
@@ -183,7 +281,7 @@ class OpenRGBLight(LightEntity):
 
         self._device_turned_on(**kwargs)
 
-        self._set_color()
+        self._set_color(transition)
         self._state = True
 
     def turn_off(self, **kwargs):
@@ -210,7 +308,7 @@ class OpenRGBLight(LightEntity):
 
     def update(self):
         """Single function to update the devices state."""
-        self._name = self._retrieve_current_name()
+        self._name = self._derived_properties()["name"]
         hsv_color = self._retrieve_current_hsv_color()
         self._hs_value = (hsv_color[0], hsv_color[1])
         self._brightness = 255.0 * (hsv_color[2] / 100.0)
@@ -221,10 +319,31 @@ class OpenRGBLight(LightEntity):
         # After updating, we no longer need to assume the state
         self._assumed_state = False
 
-    def _set_color(self):
+    def _set_color(self, transition=None):
         """Set the devices color using the library."""
         raise NotImplementedError
 
+    def _current_color(self, led):
+        """Return the color of a LED, or the one it is about to get."""
+        color = self._scheduler.target(self._device_key, led)
+        if color is None:
+            color = self._writer.pending_color(self._device_key, led)
+        if color is None:
+            color = self._state_cache.color(self._device_key, self._light, led)
+        return color
+
+    def _write_colors(self, colors, transition=None):
+        """Write {led: (r, g, b)} colors, fading them in if a transition is given."""
+        if transition:
+            self._scheduler.start(self._light, colors, transition)
+            self._assumed_state = False
+            return
+
+        # A new command overrides any fade still running on these LEDs
+        self._scheduler.cancel(self._light, colors)
+        if self._writer.set_colors(self._light, colors):
+            self._assumed_state = False
+
     # Callbacks
     @callback
     async def _delete_callback(self, dev_id):
@@ -239,16 +358,24 @@ class OpenRGBLight(LightEntity):
                 await self.async_remove()
 
     @callback
-    async def _update_callback(self, dev_id=None):
+    def _update_callback(self):
+        self.async_schedule_update_ha_state(True)
+
+    @callback
+    def _poll_callback(self):
+        """Refresh after a poll of the underlying device."""
         self.async_schedule_update_ha_state(True)
 
 class OpenRGBDevice(OpenRGBLight):
     """Representation of an OpenRGB Device."""
 
-    def __init__(self, hass, ha_dev_unique_id, entry_id, light, unique_id):
+    _unrecorded_attributes = frozenset({ATTR_SUPPRESSED_WRITES, ATTR_LED_COLORS})
+
+    def __init__(self, hass, ha_dev_unique_id, entry_id, light, unique_id, led_colors=False):
         """Initialize an OpenRGB light."""
         super().__init__(hass, ha_dev_unique_id, entry_id)
         self._light = light
+        self._device_key = orgb_unique_id(light)
         self._callbacks = []
         self._unique_id = unique_id
         self._attr_unique_id = f'{ha_dev_unique_id}_{unique_id}'
@@ -265,6 +392,8 @@ class OpenRGBDevice(OpenRGBLight):
 
         self._effects = []
 
+        self._led_colors = [] if led_colors else None
+
         self._state = True
         self._assumed_state = True
         
@@ -281,6 +410,13 @@ class OpenRGBDevice(OpenRGBLight):
                 self.hass, SIGNAL_UPDATE_ENTITY, self._update_callback
             )
         )
+        self._callbacks.append(
+            async_dispatcher_connect(
+                self.hass,
+                SIGNAL_UPDATE_DEVICE.format(self._derived_properties()["device_entity_id"]),
+                self._poll_callback,
+            )
+        )
 
     @property
     def effect_list(self):
@@ -295,7 +431,17 @@ class OpenRGBDevice(OpenRGBLight):
     @property
     def supported_features(self):
         """Return the supported features for this device."""
-        return LightEntityFeature.EFFECT
+        return LightEntityFeature.EFFECT | LightEntityFeature.TRANSITION
+
+    @property
+    def extra_state_attributes(self):
+        """Return the device specific state attributes."""
+        attributes = {
+            ATTR_SUPPRESSED_WRITES: self._state_cache.suppressed_writes(self._device_key),
+        }
+        if self._led_colors is not None:
+            attributes[ATTR_LED_COLORS] = self._led_colors
+        return attributes
 
     def _device_turned_on(self, **kwargs):
         if ATTR_EFFECT in kwargs:
@@ -309,9 +455,10 @@ class OpenRGBDevice(OpenRGBLight):
             if self._effect == EFFECT_OFF:
                 # If the light got initialized with the Off effect, switching
                 # the effect to Static or Direct is the best we can do.
-                if EFFECT_STATIC in [mode.name for mode in self._light.modes]:
+                capabilities = self._capabilities
+                if capabilities.supports_static:
                     self._effect = EFFECT_STATIC
-                elif EFFECT_DIRECT in [mode.name for mode in self._light.modes]:
+                elif capabilities.supports_direct:
                     self._effect = EFFECT_DIRECT
                 else:
                     _LOGGER.warning(
@@ -329,26 +476,37 @@ class OpenRGBDevice(OpenRGBLight):
             self._prev_hs_value = self._hs_value
             self._prev_effect = self._effect
 
-            # Use the Off effect if available
-            if EFFECT_OFF in [mode.name for mode in self._light.modes]:
+            # Use the Off effect if available, unless fading out
+            if self._capabilities.supports_off and not kwargs.get(ATTR_TRANSITION):
+                # A fade still running must not light the device up again
+                self._scheduler.cancel(self._light)
                 self._effect = EFFECT_OFF
                 self._set_effect()
             else:
                 # Otherwise, turn brightness to 0
                 self._brightness = 0.0
-                self._set_color()
+                self._set_color(kwargs.get(ATTR_TRANSITION))
 
     def _retrieve_current_name(self) -> str:
         return f"{self._light.name} {self._light.device_id}"
 
     def _retrieve_current_hsv_color(self) -> tuple[float, float, float]:
-        return color_util.color_RGB_to_hsv(*orgb_tuple(self._light.colors[0]))
+        return color_util.color_RGB_to_hsv(*self._current_color(0))
 
     def update(self):
         super().update()
 
-        self._effect = self._light.modes[self._light.active_mode].name
-        self._effects = [mode.name for mode in self._light.modes if mode.name != EFFECT_OFF]
+        self._effect = self._writer.pending_mode(self._device_key)
+        if self._effect is None:
+            self._effect = self._state_cache.mode(self._device_key, self._light)
+        self._effects = self._capabilities.effects
+
+        if self._led_colors is not None:
+            # All the LEDs in one attribute, instead of one entity each
+            self._led_colors = [
+                "#{:02x}{:02x}{:02x}".format(*self._current_color(led.id))
+                for led in self._light.leds
+            ]
 
         # If the effect is Off, the light is off
         if self._effect == EFFECT_OFF:
@@ -357,31 +515,39 @@ class OpenRGBDevice(OpenRGBLight):
     # Functions to modify the devices state
     def _set_effect(self):
         """Set the devices effect."""
-        try:
-            self._light.set_mode(self._effect)
-        except ConnectionError:
-            self.hass.data[DOMAIN][self._entry_id]["connection_failed"]()
+        if self._effect not in self._capabilities.modes:
+            _LOGGER.warning(
+                "The light %s does not support the '%s' effect.",
+                self._name,
+                self._effect,
+            )
+            return
+        self._writer.set_mode(self._light, self._effect)
 
-    def _set_color(self):
+    def _set_color(self, transition=None):
         """Set the devices color using the library."""
         color = color_util.color_hsv_to_RGB(
             *(self._hs_value), 100.0 * (self._brightness / 255.0)
         )
-        try:
-            self._light.set_color(RGBUtils.RGBColor(*color))
-            self._assumed_state = False
-        except ConnectionError:
-            self.hass.data[DOMAIN][self._entry_id]["connection_failed"]()
+        self._write_colors(
+            dict.fromkeys(range(self._capabilities.led_count), color), transition
+        )
 
 class OpenRGBLed(OpenRGBLight):
     """Representation of a LED from an OpenRGB Device."""
 
-    def __init__(self, hass, ha_dev_unique_id, entry_id, light, led_id, unique_id):
+    def __init__(
+        self, hass, ha_dev_unique_id, entry_id, light, led_id, unique_id, update_interval=0
+    ):
         """Initialize an OpenRGB light."""
         super().__init__(hass, ha_dev_unique_id, entry_id)
         self._light = light
+        self._device_key = orgb_unique_id(light)
         self._callbacks = []
         self._led_id = led_id
+        self._update_interval = update_interval
+        self._last_update = None
+        self._last_available = None
         self._unique_id = unique_id
         self._attr_unique_id = f'{ha_dev_unique_id}_{unique_id}'
         self._name = self._retrieve_current_name()
@@ -410,6 +576,37 @@ class OpenRGBLed(OpenRGBLight):
                 self.hass, SIGNAL_UPDATE_ENTITY, self._update_callback
             )
         )
+        self._callbacks.append(
+            async_dispatcher_connect(
+                self.hass,
+                SIGNAL_UPDATE_DEVICE.format(self._derived_properties()["device_entity_id"]),
+                self._poll_callback,
+            )
+        )
+
+    @callback
+    def _update_callback(self):
+        """Refresh on a global update, throttled unless availability changed."""
+        if self.available != self._last_available:
+            self._last_available = self.available
+            self._last_update = time.monotonic()
+            self.async_schedule_update_ha_state(True)
+            return
+        self._poll_callback()
+
+    @callback
+    def _poll_callback(self):
+        """Refresh after a poll, at most every update interval.
+
+        This spares the state machine and the recorder; only availability
+        changes go through right away.
+        """
+        now = time.monotonic()
+        if self._update_interval:
+            if self._last_update is not None and now - self._last_update < self._update_interval:
+                return
+            self._last_update = now
+        self.async_schedule_update_ha_state(True)
 
     @property
     def led_id(self):
@@ -419,7 +616,7 @@ class OpenRGBLed(OpenRGBLight):
     @property
     def supported_features(self):
         """Return the supported features for this device."""
-        return LightEntityFeature(0)
+        return LightEntityFeature.TRANSITION
 
     def _device_turned_off(self, **kwargs):
         if self._brightness != 0.0:
@@ -428,22 +625,18 @@ class OpenRGBLed(OpenRGBLight):
             self._prev_hs_value = self._hs_value
 
             self._brightness = 0.0
-            self._set_color()
+            self._set_color(kwargs.get(ATTR_TRANSITION))
 
     def _retrieve_current_name(self) -> str:
         return f"{self._light.name} {self._light.device_id} LED {self._led_id}"
         return f"{self._light.name} {self._light.device_id} {self._light.leds[self._led_id].name}"
 
     def _retrieve_current_hsv_color(self) -> tuple[float, float, float]:
-        return color_util.color_RGB_to_hsv(*orgb_tuple(self._light.colors[self._led_id]))
+        return color_util.color_RGB_to_hsv(*self._current_color(self._led_id))
 
-    def _set_color(self):
+    def _set_color(self, transition=None):
         """Set the devices color using the library."""
         color = color_util.color_hsv_to_RGB(
             *(self._hs_value), 100.0 * (self._brightness / 255.0)
         )
-        try:
-            self._light.leds[self._led_id].set_color(RGBUtils.RGBColor(*color))
-            self._assumed_state = False
-        except ConnectionError:
-            self.hass.data[DOMAIN][self._entry_id]["connection_failed"]()
\ No newline at end of file
+        self._write_colors({self._led_id: color}, transition)
\ No newline at end of file
@@ -0,0 +1,31 @@
+"""Per controller rate limiting for the OpenRGB Integration."""
+import time
+
+import voluptuous as vol
+
+import homeassistant.helpers.config_validation as cv
+
+RATE_LIMIT_SCHEMA = vol.Schema(
+    {cv.string: vol.All(vol.Coerce(float), vol.Range(min=0.1))}
+)
+
+
+class TokenBucket:
+    """Allow rate writes per second, in bursts of up to burst writes."""
+
+    def __init__(self, rate, burst):
+        """Initialize a full bucket."""
+        self._rate = rate
+        self._burst = burst
+        self._tokens = burst
+        self._stamp = time.monotonic()
+
+    def take(self):
+        """Take a token, or return how many seconds until one is available."""
+        now = time.monotonic()
+        self._tokens = min(self._burst, self._tokens + (now - self._stamp) * self._rate)
+        self._stamp = now
+        if self._tokens >= 1.0:
+            self._tokens -= 1.0
+            return 0.0
+        return (1.0 - self._tokens) / self._rate
@@ -0,0 +1,83 @@
+"""Profile select for the OpenRGB Integration."""
+import logging
+
+from homeassistant.components.select import SelectEntity
+from homeassistant.core import callback
+from homeassistant.helpers.device_registry import DeviceEntryType
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
+
+from .const import DOMAIN, SIGNAL_UPDATE_ENTITY, SIGNAL_UPDATE_PROFILES
+
+_LOGGER = logging.getLogger(__name__)
+
+
+async def async_setup_entry(hass, config_entry, async_add_entities):
+    """Set up the OpenRGB profile select."""
+    ha_dev_unique_id = hass.data[DOMAIN][config_entry.entry_id]["ha_dev_unique_id"]
+    async_add_entities(
+        [OpenRGBProfileSelect(ha_dev_unique_id, config_entry.entry_id, config_entry.title)]
+    )
+
+
+class OpenRGBProfileSelect(SelectEntity):
+    """Representation of the profiles of an OpenRGB server."""
+
+    _attr_icon = "mdi:palette"
+    _attr_should_poll = False
+
+    def __init__(self, ha_dev_unique_id, entry_id, host):
+        """Initialize the profile select."""
+        self._entry_id = entry_id
+        self._callbacks = []
+        self._attr_unique_id = f"{ha_dev_unique_id}_profile"
+        self._attr_name = f"OpenRGB {host} Profile"
+        self._attr_device_info = {
+            "identifiers": {(DOMAIN, ha_dev_unique_id)},
+            "name": f"OpenRGB {host}",
+            "manufacturer": "OpenRGB",
+            "entry_type": DeviceEntryType.SERVICE,
+        }
+
+    async def async_added_to_hass(self):
+        """Call when entity is added to hass."""
+        self._callbacks.append(
+            async_dispatcher_connect(
+                self.hass, SIGNAL_UPDATE_PROFILES, self.async_write_ha_state
+            )
+        )
+        self._callbacks.append(
+            async_dispatcher_connect(
+                self.hass, SIGNAL_UPDATE_ENTITY, self._update_callback
+            )
+        )
+
+    async def async_will_remove_from_hass(self):
+        """Cleanup signal handlers."""
+        for signal_callback in self._callbacks:
+            signal_callback()
+
+    @callback
+    def _update_callback(self):
+        self.async_write_ha_state()
+
+    @property
+    def available(self):
+        """Return if the server is online."""
+        return self.hass.data[DOMAIN][self._entry_id]["online"]
+
+    @property
+    def options(self):
+        """Return the profiles of the server."""
+        return self.hass.data[DOMAIN][self._entry_id]["profiles"]
+
+    @property
+    def current_option(self):
+        """Return the last profile loaded from Home Assistant."""
+        active_profile = self.hass.data[DOMAIN][self._entry_id]["active_profile"]
+        if active_profile not in self.options:
+            return None
+        return active_profile
+
+    async def async_select_option(self, option):
+        """Load the selected profile."""
+        await self.hass.data[DOMAIN][self._entry_id]["load_profile"](option)
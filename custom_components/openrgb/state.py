@@ -0,0 +1,162 @@
+"""Optimistic device state for the OpenRGB Integration."""
+import threading
+import time
+
+from openrgb import utils as RGBUtils
+
+from .const import STATE_CACHE_TTL
+from .helpers import orgb_tuple
+
+
+class DeviceStateCache:
+    """Overlay our own writes on top of the polled device data.
+
+    Writes are sent without asking the server to echo the device back, so
+    the polled data stays stale until the next full update. Each written
+    color or mode is kept here as pending and shadows the polled value.
+    Once a poll reports it, a color becomes acknowledged and is kept for as
+    long as the device still reports it; anything else wins over it.
+
+    The same overlay is the last known device state that writes are checked
+    against, so that writes which would change nothing are never sent.
+    """
+
+    def __init__(self):
+        """Initialize an empty cache."""
+        self._lock = threading.Lock()
+        self._devices = {}
+        self._suppressed = {}
+
+    def _entry(self, key):
+        return self._devices.setdefault(
+            key, {"colors": {}, "mode": None, "stamp": 0.0, "unknown": False}
+        )
+
+    def record_colors(self, key, colors):
+        """Record written colors, as a {led: (requested, written)} mapping."""
+        with self._lock:
+            entry = self._entry(key)
+            for led, (requested, written) in colors.items():
+                entry["colors"][led] = (tuple(requested), tuple(written), True)
+            entry["stamp"] = time.monotonic()
+
+    def record_mode(self, key, mode):
+        """Record a written mode name."""
+        with self._lock:
+            entry = self._entry(key)
+            entry["mode"] = mode
+            entry["stamp"] = time.monotonic()
+
+    def color(self, key, device, led):
+        """Return the last known color of a LED, as requested by us if it was."""
+        with self._lock:
+            entry = self._devices.get(key)
+            if entry is not None and led in entry["colors"]:
+                return entry["colors"][led][0]
+        return orgb_tuple(device.colors[led])
+
+    def invalidate(self, key):
+        """Forget what we know of a device's colors and mode until the next poll."""
+        with self._lock:
+            entry = self._entry(key)
+            entry["colors"].clear()
+            entry["mode"] = None
+            entry["stamp"] = 0.0
+            entry["unknown"] = True
+
+    def written_colors(self, key, device):
+        """Return the last known colors of every LED, as written to the device."""
+        colors = [orgb_tuple(color) for color in device.colors]
+        with self._lock:
+            entry = self._devices.get(key)
+            if entry is not None:
+                for led, (_, written, _) in entry["colors"].items():
+                    if led < len(colors):
+                        colors[led] = written
+        return colors
+
+    def mode(self, key, device):
+        """Return the last known mode name of a device."""
+        with self._lock:
+            entry = self._devices.get(key)
+            if entry is not None and entry["mode"] is not None:
+                return entry["mode"]
+        return device.modes[device.active_mode].name
+
+    def skip_colors(self, key, device, colors):
+        """Return True, and count it, if writing {led: color} changes nothing."""
+        with self._lock:
+            entry = self._devices.get(key)
+            if entry is not None and entry["unknown"]:
+                return False
+            known = entry["colors"] if entry is not None else {}
+            mode = device.modes[device.active_mode]
+            per_led = mode.color_mode == RGBUtils.ModeColors.PER_LED
+            if not per_led:
+                # Outside of per LED modes the device shows its mode colors,
+                # only our own pending writes are newer than those
+                mode_colors = {orgb_tuple(color) for color in mode.colors}
+            for led, color in colors.items():
+                if led in known and (per_led or known[led][2]):
+                    current = known[led][1]
+                elif per_led:
+                    current = orgb_tuple(device.colors[led])
+                elif len(mode_colors) == 1:
+                    current = next(iter(mode_colors))
+                else:
+                    return False
+                if current != tuple(color):
+                    return False
+            self._suppressed[key] = self._suppressed.get(key, 0) + 1
+            return True
+
+    def skip_mode(self, key, device, mode):
+        """Return True, and count it, if writing a mode name changes nothing."""
+        with self._lock:
+            entry = self._devices.get(key)
+            if entry is not None and entry["unknown"]:
+                return False
+            if entry is not None and entry["mode"] is not None:
+                current = entry["mode"]
+            else:
+                current = device.modes[device.active_mode].name
+            if current != mode:
+                return False
+            self._suppressed[key] = self._suppressed.get(key, 0) + 1
+            return True
+
+    def suppressed_writes(self, key):
+        """Return how many writes to a device were skipped as no-ops."""
+        with self._lock:
+            return self._suppressed.get(key, 0)
+
+    def reconcile(self, key, device):
+        """Confirm or drop our writes against freshly polled device data."""
+        with self._lock:
+            entry = self._devices.get(key)
+            if entry is None:
+                return
+
+            entry["unknown"] = False
+            expired = time.monotonic() - entry["stamp"] > STATE_CACHE_TTL
+            colors = device.colors
+            for led, (requested, written, pending) in list(entry["colors"].items()):
+                if led < len(colors) and orgb_tuple(colors[led]) == written:
+                    entry["colors"][led] = (requested, written, False)
+                elif not pending or expired:
+                    del entry["colors"][led]
+
+            if entry["mode"] is not None and (
+                expired or device.modes[device.active_mode].name == entry["mode"]
+            ):
+                entry["mode"] = None
+
+    def retain(self, keys):
+        """Forget about every device not in keys."""
+        with self._lock:
+            for key in list(self._devices):
+                if key not in keys:
+                    self._devices.pop(key)
+            for key in list(self._suppressed):
+                if key not in keys:
+                    self._suppressed.pop(key)
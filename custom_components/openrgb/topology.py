@@ -0,0 +1,99 @@
+"""Device topology tracking for the OpenRGB Integration."""
+import threading
+
+from .const import EFFECT_DIRECT, EFFECT_OFF, EFFECT_STATIC
+
+
+def orgb_topology(device):
+    """Return a hashable signature of everything a device's layout depends on."""
+    return (
+        device.name,
+        device.type,
+        device.metadata.vendor,
+        device.metadata.description,
+        device.metadata.version,
+        device.metadata.serial,
+        tuple(mode.name for mode in device.modes),
+        tuple((zone.name, len(zone.leds)) for zone in device.zones),
+        len(device.leds),
+    )
+
+
+class DeviceCapabilities:
+    """Lookup tables of a device, built once per topology version."""
+
+    def __init__(self, device):
+        """Index the modes, zones and LEDs of a device."""
+        self.modes = {mode.name: index for index, mode in enumerate(device.modes)}
+        self.effects = [name for name in self.modes if name != EFFECT_OFF]
+        self.supports_off = EFFECT_OFF in self.modes
+        self.supports_static = EFFECT_STATIC in self.modes
+        self.supports_direct = EFFECT_DIRECT in self.modes
+
+        # Zones are laid out back to back over the device's LEDs
+        self.zones = {}
+        self.zone_ranges = []
+        led_zones = []
+        start = 0
+        for zone in device.zones:
+            end = start + len(zone.leds)
+            self.zones[zone.name] = zone.id
+            self.zone_ranges.append((start, end))
+            led_zones.extend([zone.id] * (end - start))
+            start = end
+        self.led_zones = tuple(led_zones)
+        self.led_count = len(device.leds)
+
+
+class TopologyTracker:
+    """Version the topology of every device and cache its capabilities.
+
+    The poll refreshes each device; whenever its signature changes it gets
+    a new version and its capabilities are rebuilt, so command paths never
+    have to scan mode or LED lists themselves. Versions are unique over all
+    devices, so anything derived from a device can be cached on its version.
+    """
+
+    def __init__(self):
+        """Initialize an empty tracker."""
+        self._lock = threading.Lock()
+        self._devices = {}
+        self._version = 0
+
+    def _refresh(self, key, device):
+        signature = orgb_topology(device)
+        known = self._devices.get(key)
+        if known is not None and known[0] == signature:
+            return known
+        self._version += 1
+        known = (signature, self._version, DeviceCapabilities(device))
+        self._devices[key] = known
+        return known
+
+    def refresh(self, key, device):
+        """Check a freshly polled device and return its topology version."""
+        with self._lock:
+            return self._refresh(key, device)[1]
+
+    def version(self, key, device):
+        """Return the current topology version of a device."""
+        with self._lock:
+            known = self._devices.get(key)
+            if known is None:
+                known = self._refresh(key, device)
+            return known[1]
+
+    def capabilities(self, key, device):
+        """Return the capabilities of a device."""
+        with self._lock:
+            known = self._devices.get(key)
+            if known is None:
+                known = self._refresh(key, device)
+            return known[2]
+
+    def retain(self, keys):
+        """Forget about every device not in keys."""
+        with self._lock:
+            for key in list(self._devices):
+                if key not in keys:
+                    self._devices.pop(key)
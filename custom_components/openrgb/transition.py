@@ -0,0 +1,147 @@
+"""Client side transitions for the OpenRGB Integration."""
+import logging
+import threading
+import time
+
+from openrgb import utils as RGBUtils
+
+from homeassistant.core import callback
+from homeassistant.helpers.event import async_track_time_interval
+
+from .const import DOMAIN, FRAME_INTERVAL, ORGB_STATE_CACHE, ORGB_WRITER
+from .helpers import orgb_unique_id
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def _blend(start, end, progress):
+    """Interpolate between two (r, g, b) colors."""
+    return tuple(
+        round(first + (last - first) * progress) for first, last in zip(start, end)
+    )
+
+
+class FrameScheduler:
+    """Drive every running transition of an entry from a single tick.
+
+    Each tick interpolates all the LEDs in transition and sends one write per
+    device. A device whose previous frame is still being sent skips the
+    frame, so a slow controller only slows down its own transitions.
+    """
+
+    def __init__(self, hass, entry_id):
+        """Initialize an idle scheduler."""
+        self._hass = hass
+        self._entry_id = entry_id
+        self._lock = threading.Lock()
+        self._transitions = {}
+        self._busy = set()
+        self._unsub = None
+        self.skipped_frames = 0
+
+    @property
+    def _data(self):
+        return self._hass.data[DOMAIN][self._entry_id]
+
+    def start(self, device, colors, duration):
+        """Fade {led: (r, g, b)} colors in over duration seconds.
+
+        Devices outside of a per LED mode get the final colors at once, so
+        this may write to the server and must run in the executor.
+        """
+        writer = self._data[ORGB_WRITER]
+        if writer.color_mode(device) != RGBUtils.ModeColors.PER_LED:
+            # The device only takes uniform colors in its mode, which the
+            # frames of a fade are not, so go straight to the final colors
+            self.cancel(device, colors)
+            writer.set_colors(device, colors)
+            return
+
+        key = orgb_unique_id(device)
+        state_cache = self._data[ORGB_STATE_CACHE]
+        begin = time.monotonic()
+        with self._lock:
+            device_transitions = self._transitions.setdefault(key, (device, {}))[1]
+            for led, color in colors.items():
+                start = state_cache.color(key, device, led)
+                device_transitions[led] = (start, tuple(color), begin, duration)
+        self._hass.add_job(self._async_ensure_running)
+
+    def target(self, key, led):
+        """Return the color a LED is fading to, if it is in transition."""
+        with self._lock:
+            if key in self._transitions:
+                transition = self._transitions[key][1].get(led)
+                if transition is not None:
+                    return transition[1]
+        return None
+
+    def cancel(self, device, leds=None):
+        """Stop the transitions of some LEDs, or all of them, of a device where they are."""
+        key = orgb_unique_id(device)
+        with self._lock:
+            if key not in self._transitions:
+                return
+            if leds is None:
+                self._transitions.pop(key)
+                return
+            device_transitions = self._transitions[key][1]
+            for led in leds:
+                device_transitions.pop(led, None)
+            if not device_transitions:
+                self._transitions.pop(key)
+
+    @callback
+    def _async_ensure_running(self):
+        if self._unsub is None:
+            self._unsub = async_track_time_interval(
+                self._hass, self._async_tick, FRAME_INTERVAL
+            )
+
+    @callback
+    def async_stop(self):
+        """Drop every transition and stop ticking."""
+        with self._lock:
+            self._transitions.clear()
+        if self._unsub is not None:
+            self._unsub()
+            self._unsub = None
+
+    async def _async_tick(self, event_time):
+        now = time.monotonic()
+        frames = []
+        with self._lock:
+            for key, (device, device_transitions) in list(self._transitions.items()):
+                if key in self._busy:
+                    self.skipped_frames += 1
+                    continue
+
+                colors = {}
+                for led, (start, end, begin, duration) in list(device_transitions.items()):
+                    progress = (now - begin) / duration if duration > 0 else 1.0
+                    if progress >= 1.0:
+                        colors[led] = end
+                        del device_transitions[led]
+                    else:
+                        colors[led] = _blend(start, end, progress)
+                if not device_transitions:
+                    self._transitions.pop(key)
+
+                self._busy.add(key)
+                frames.append((key, device, colors))
+
+            if not self._transitions and self._unsub is not None:
+                self._unsub()
+                self._unsub = None
+
+        for key, device, colors in frames:
+            self._hass.async_add_executor_job(self._send_frame, key, device, colors)
+
+    def _send_frame(self, key, device, colors):
+        try:
+            self._data[ORGB_WRITER].set_colors(device, colors)
+        except Exception:  # pylint: disable=broad-except
+            _LOGGER.exception("Error sending a transition frame to %s", device.name)
+        finally:
+            with self._lock:
+                self._busy.discard(key)
@@ -0,0 +1,190 @@
+"""DDP pixel stream ingest for the OpenRGB Integration."""
+import asyncio
+import logging
+import struct
+import threading
+
+import voluptuous as vol
+
+import homeassistant.helpers.config_validation as cv
+
+from .const import (
+    CONF_DEVICE,
+    CONF_START,
+    CONF_ZONE,
+    DOMAIN,
+    ORGB_DATA,
+    ORGB_TOPOLOGY,
+    ORGB_WRITER,
+)
+from .helpers import orgb_unique_id
+
+_LOGGER = logging.getLogger(__name__)
+
+MAPPING_SCHEMA = vol.Schema(
+    [
+        vol.Schema(
+            {
+                vol.Required(CONF_DEVICE): cv.string,
+                vol.Optional(CONF_ZONE): cv.string,
+                vol.Optional(CONF_START, default=0): cv.positive_int,
+            }
+        )
+    ]
+)
+
+DDP_HEADER = struct.Struct(">BBBBIH")
+DDP_VERSION_1 = 0x40
+DDP_FLAG_TIMECODE = 0x10
+DDP_FLAG_STORAGE = 0x08
+DDP_FLAG_REPLY = 0x04
+DDP_FLAG_QUERY = 0x02
+DDP_FLAG_PUSH = 0x01
+DDP_ID_DISPLAY = 1
+
+
+class DDPListener(asyncio.DatagramProtocol):
+    """Forward DDP pixel frames to OpenRGB devices and zones.
+
+    Packets are assembled into one frame buffer; when a packet carries the
+    push flag, every mapping gets its slice of that buffer as a single write.
+    A device whose previous frame is still being sent drops the new one, and
+    packets older than the last one seen are dropped as late. The frame never
+    grows past the last pixel the mapping uses.
+    """
+
+    def __init__(self, hass, entry_id, mapping):
+        """Initialize the listener for the given pixel mapping."""
+        self._hass = hass
+        self._entry_id = entry_id
+        self._mapping = MAPPING_SCHEMA(mapping)
+        self._transport = None
+        self._lock = threading.Lock()
+        self._frame = bytearray()
+        self._frame_size = None
+        self._sequence = 0
+        self._busy = set()
+        self.frames = 0
+        self.dropped_frames = 0
+        self.late_frames = 0
+
+    @property
+    def _data(self):
+        return self._hass.data[DOMAIN][self._entry_id]
+
+    def connection_made(self, transport):
+        """Keep the transport to close it later."""
+        self._transport = transport
+
+    def close(self):
+        """Stop listening."""
+        if self._transport is not None:
+            self._transport.close()
+            self._transport = None
+
+    def datagram_received(self, data, addr):
+        """Copy a DDP packet into the frame, and forward the frame on push."""
+        if len(data) < DDP_HEADER.size:
+            return
+        flags, sequence, _, destination, offset, length = DDP_HEADER.unpack_from(data)
+        if flags & 0xC0 != DDP_VERSION_1 or destination != DDP_ID_DISPLAY:
+            return
+        if flags & (DDP_FLAG_STORAGE | DDP_FLAG_REPLY | DDP_FLAG_QUERY):
+            return
+
+        sequence &= 0x0F
+        if sequence:
+            if self._sequence and (sequence - self._sequence) % 16 > 8:
+                self.late_frames += 1
+                return
+            self._sequence = sequence
+
+        start = DDP_HEADER.size + (4 if flags & DDP_FLAG_TIMECODE else 0)
+        payload = memoryview(data)[start:start + length]
+        end = offset + len(payload)
+        if self._frame_size is None:
+            self._frame_size = self._targets()[1]
+        # Never let a packet size the frame beyond what the mapping uses
+        if end <= self._frame_size:
+            if end > len(self._frame):
+                self._frame.extend(bytes(end - len(self._frame)))
+            self._frame[offset:end] = payload
+
+        if flags & DDP_FLAG_PUSH:
+            self._push()
+
+    def _targets(self):
+        """Return the (device, zone, start, count) of each mapping, and the frame size."""
+        devices = self._data[ORGB_DATA].devices
+        targets = []
+        frame_size = 0
+        for target in self._mapping:
+            device = next(
+                (
+                    device
+                    for device in devices
+                    if device is not None
+                    and target[CONF_DEVICE] in (device.name, device.metadata.serial)
+                ),
+                None,
+            )
+            if device is None:
+                continue
+
+            zone = None
+            count = len(device.leds)
+            if CONF_ZONE in target:
+                capabilities = self._data[ORGB_TOPOLOGY].capabilities(
+                    orgb_unique_id(device), device
+                )
+                zone = capabilities.zones.get(target[CONF_ZONE])
+                if zone is None:
+                    continue
+                first, last = capabilities.zone_ranges[zone]
+                count = last - first
+
+            if count == 0:
+                continue
+            targets.append((device, zone, target[CONF_START], count))
+            frame_size = max(frame_size, 3 * (target[CONF_START] + count))
+        return targets, frame_size
+
+    def _push(self):
+        self.frames += 1
+        if not self._data["online"]:
+            self.dropped_frames += 1
+            return
+        targets, self._frame_size = self._targets()
+        # Hand the frame buffer over to the writes and assemble the next
+        # frame in a fresh one, so the slices below are never copied
+        frame = memoryview(self._frame)
+        self._frame = bytearray(len(self._frame))
+        writes = {}
+        for device, zone, start, count in targets:
+            pixels = frame[3 * start:3 * (start + count)]
+            if len(pixels) != 3 * count:
+                continue
+            writes.setdefault(orgb_unique_id(device), (device, []))[1].append(
+                (zone, pixels)
+            )
+
+        for key, (device, slices) in writes.items():
+            with self._lock:
+                if key in self._busy:
+                    self.dropped_frames += 1
+                    continue
+                self._busy.add(key)
+            self._hass.async_add_executor_job(self._send_frame, key, device, slices)
+
+    def _send_frame(self, key, device, slices):
+        try:
+            writer = self._data[ORGB_WRITER]
+            for zone, pixels in slices:
+                if not writer.set_raw(device, pixels, zone):
+                    with self._lock:
+                        self.dropped_frames += 1
+        except Exception:  # pylint: disable=broad-except
+            _LOGGER.exception("Error forwarding a DDP frame to %s", device.name)
+        finally:
+            with self._lock:
+                self._busy.discard(key)
@@ -0,0 +1,328 @@
+"""Write path for the OpenRGB Integration."""
+from functools import partial
+import struct
+import threading
+
+from openrgb import utils as RGBUtils
+
+from homeassistant.core import callback
+from homeassistant.helpers.event import async_call_later
+
+from .const import DOMAIN, ORGB_STATE_CACHE, ORGB_TOPOLOGY, RATE_LIMIT_BURST
+from .helpers import orgb_match, orgb_unique_id
+from .ratelimit import TokenBucket
+
+
+def _pack(colors):
+    """Pack (r, g, b) colors the way the SDK expects them, padded to 4 bytes."""
+    return b"".join(struct.pack("BBBx", *color) for color in colors)
+
+
+class DeviceWriter:
+    """Send colors and modes to the devices of an entry.
+
+    Every write goes through here: colors get the device's color correction
+    applied, writes that would not change the last known state are dropped,
+    and what was written is recorded in the state cache. Colors the current
+    mode of a device would ignore are refused, and never recorded.
+
+    Devices with a rate limit get a token bucket. A write finding it empty
+    is merged into a single pending write for the device, sent as soon as a
+    token is available, so bursts collapse into their final state.
+
+    While the server is offline, writes are merged the same way into the
+    desired state of each device, and replayed in one pass once it is back.
+    """
+
+    def __init__(self, hass, entry_id, corrections, rate_limits):
+        """Initialize the writer with the compiled color corrections."""
+        self._hass = hass
+        self._entry_id = entry_id
+        self._corrections = corrections
+        self._rate_limits = rate_limits
+        self._lock = threading.Lock()
+        self._buckets = {}
+        self._merged = {}
+        self._flushes = {}
+        self._stopped = False
+        self._queued = {}
+        self.merged_writes = 0
+
+    @property
+    def _data(self):
+        return self._hass.data[DOMAIN][self._entry_id]
+
+    def correction(self, device):
+        """Return the color correction applying to a device, if any."""
+        return orgb_match(self._corrections, device)
+
+    def _bucket(self, key, device):
+        if key not in self._buckets:
+            rate = orgb_match(self._rate_limits, device)
+            self._buckets[key] = TokenBucket(rate, RATE_LIMIT_BURST) if rate else None
+        return self._buckets[key]
+
+    def _throttle(self, key, device, colors=None, mode=None):
+        """Merge a write into the pending one of its device if over its rate limit."""
+        with self._lock:
+            bucket = self._bucket(key, device)
+            if bucket is None:
+                return False
+
+            merged = self._merged.get(key)
+            if merged is None:
+                delay = bucket.take()
+                if not delay:
+                    return False
+                merged = self._merged[key] = {"device": device, "colors": {}, "mode": None}
+                self._hass.add_job(self._async_schedule_flush, key, delay)
+
+            self.merged_writes += 1
+            if colors:
+                merged["colors"].update(colors)
+            if mode is not None:
+                merged["mode"] = mode
+            return True
+
+    def _queue(self, key, colors=None, mode=None):
+        """Merge a write into the desired state of its device until reconnected."""
+        with self._lock:
+            queued = self._queued.setdefault(key, {"colors": {}, "mode": None})
+            if colors:
+                queued["colors"].update(colors)
+            if mode is not None:
+                queued["mode"] = mode
+        return True
+
+    @property
+    def queued_writes(self):
+        """Return the number of devices with writes waiting for the server."""
+        with self._lock:
+            return len(self._queued)
+
+    def pending_color(self, key, led):
+        """Return the color a LED will get from a merged or queued write, if any."""
+        with self._lock:
+            for pending in (self._merged, self._queued):
+                merged = pending.get(key)
+                if merged is not None and led in merged["colors"]:
+                    return merged["colors"][led]
+        return None
+
+    def pending_mode(self, key):
+        """Return the mode a device will get from a merged or queued write, if any."""
+        with self._lock:
+            for pending in (self._merged, self._queued):
+                merged = pending.get(key)
+                if merged is not None and merged["mode"] is not None:
+                    return merged["mode"]
+        return None
+
+    def discard(self, key):
+        """Drop the merged and queued writes of a device."""
+        with self._lock:
+            self._merged.pop(key, None)
+            self._queued.pop(key, None)
+
+    def replay(self, devices):
+        """Write the state queued while offline to the freshly polled devices.
+
+        Modes go first, then colors, each device getting only its final
+        state. Devices that did not come back are forgotten.
+        """
+        with self._lock:
+            queued, self._queued = self._queued, {}
+        if not queued:
+            return
+
+        devices = {orgb_unique_id(device): device for device in devices}
+        for key, write in queued.items():
+            if key in devices and write["mode"] is not None:
+                capabilities = self._data[ORGB_TOPOLOGY].capabilities(key, devices[key])
+                if write["mode"] in capabilities.modes:
+                    self.set_mode(devices[key], write["mode"])
+        for key, write in queued.items():
+            if key in devices and write["colors"]:
+                led_count = len(devices[key].leds)
+                colors = {
+                    led: color for led, color in write["colors"].items() if led < led_count
+                }
+                if colors:
+                    self.set_colors(devices[key], colors)
+
+    @callback
+    def _async_schedule_flush(self, key, delay):
+        with self._lock:
+            if self._stopped:
+                return
+            self._flushes[key] = async_call_later(
+                self._hass, delay, partial(self._flush, key)
+            )
+
+    @callback
+    def async_stop(self):
+        """Cancel the merged writes still waiting for their turn."""
+        with self._lock:
+            self._stopped = True
+            flushes, self._flushes = self._flushes, {}
+            self._merged.clear()
+        for cancel in flushes.values():
+            cancel()
+
+    def _flush(self, key, _now=None):
+        with self._lock:
+            self._flushes.pop(key, None)
+            merged = self._merged.pop(key, None)
+            if merged is None or self._stopped:
+                return
+            self._buckets[key].take()
+
+        if merged["mode"] is not None:
+            self._set_mode(merged["device"], merged["mode"])
+        if merged["colors"]:
+            self._set_colors(merged["device"], merged["colors"])
+
+    def set_colors(self, device, colors, zone=None):
+        """Write {led: (r, g, b)} colors, return whether the device will have them.
+
+        The colors go out in a single packet, for the given zone if they all
+        belong to it, else for the whole device.
+        """
+        if self._throttle(orgb_unique_id(device), device, colors=colors):
+            return True
+        return self._set_colors(device, colors, zone)
+
+    def _set_colors(self, device, colors, zone=None):
+        key = orgb_unique_id(device)
+        if not self._data["online"]:
+            return self._queue(key, colors=colors)
+
+        leds = list(colors)
+        correction = self.correction(device)
+        uniform = (
+            len(leds) == len(device.leds) and len(set(map(tuple, colors.values()))) == 1
+        )
+        if uniform:
+            # The whole device in one color, only correct that color once
+            requested = [tuple(colors[leds[0]])]
+            written = correction.apply(requested) if correction else requested
+            requested, written = requested * len(leds), written * len(leds)
+        else:
+            requested = [tuple(colors[led]) for led in leds]
+            written = correction.apply(requested) if correction else requested
+            uniform = len(leds) == len(device.leds) and len(set(written)) == 1
+
+        state_cache = self._data[ORGB_STATE_CACHE]
+        if state_cache.skip_colors(key, device, dict(zip(leds, written))):
+            return True
+
+        color_mode = self.color_mode(device)
+        if color_mode != RGBUtils.ModeColors.PER_LED and not (
+            uniform and color_mode == RGBUtils.ModeColors.MODE_SPECIFIC
+        ):
+            # The device would ignore these colors in its current mode
+            return False
+
+        try:
+            if uniform:
+                # Also sets the color of a mode with a mode specific color
+                device.set_color(RGBUtils.RGBColor(*written[0]), fast=True)
+            elif len(leds) == 1:
+                device.leds[leds[0]].set_color(RGBUtils.RGBColor(*written[0]), fast=True)
+            else:
+                full = state_cache.written_colors(key, device)
+                for led, color in zip(leds, written):
+                    full[led] = color
+                first, last = 0, len(full)
+                if zone is not None:
+                    capabilities = self._data[ORGB_TOPOLOGY].capabilities(key, device)
+                    first, last = capabilities.zone_ranges[zone]
+                    if not all(first <= led < last for led in leds):
+                        first, last, zone = 0, len(full), None
+                self._send_leds(device, _pack(full[first:last]), zone)
+        except ConnectionError:
+            self._data["connection_failed"]()
+            return self._queue(key, colors=colors)
+
+        state_cache.record_colors(
+            key,
+            {led: pair for led, pair in zip(leds, zip(requested, written))},
+        )
+        return True
+
+    @staticmethod
+    def color_mode(device):
+        """Return how the current mode of a device takes colors."""
+        return device.modes[device.active_mode].color_mode
+
+    @staticmethod
+    def _send_leds(device, colors, zone=None):
+        """Send packed (r, g, b, 0) colors in an UpdateLEDs or UpdateZoneLEDs packet."""
+        count = len(colors) // 4
+        if zone is None:
+            packet_type = RGBUtils.PacketType.RGBCONTROLLER_UPDATELEDS
+            header = struct.pack("IH", 6 + len(colors), count)
+        else:
+            packet_type = RGBUtils.PacketType.RGBCONTROLLER_UPDATEZONELEDS
+            header = struct.pack("IiH", 10 + len(colors), zone, count)
+        device.comms.send_header(device.id, packet_type, len(header) + len(colors))
+        device.comms.send_data(header + colors)
+
+    def set_raw(self, device, raw, zone=None):
+        """Write packed (r, g, b) colors to every LED of a device or zone.
+
+        This is the streaming path: the buffer is laid out straight into a
+        single UpdateLEDs or UpdateZoneLEDs packet, with no RGBColor objects
+        and no no-op check, and the state cache only learns that the device
+        colors are unknown until the next poll. Over the rate limit, the
+        frame is dropped as the next one supersedes it anyway. Return whether
+        the frame was sent.
+        """
+        key = orgb_unique_id(device)
+        with self._lock:
+            bucket = self._bucket(key, device)
+            if bucket is not None and bucket.take():
+                return False
+
+        count = len(raw) // 3
+        colors = bytearray(4 * count)
+        colors[0::4] = raw[0::3]
+        colors[1::4] = raw[1::3]
+        colors[2::4] = raw[2::3]
+        correction = self.correction(device)
+        if correction:
+            correction.apply_raw(colors, 4)
+
+        try:
+            self._send_leds(device, colors, zone)
+        except ConnectionError:
+            self._data["connection_failed"]()
+            return False
+
+        self._data[ORGB_STATE_CACHE].invalidate(key)
+        return True
+
+    def set_mode(self, device, mode):
+        """Write a mode by name, return whether the device will be in it."""
+        if self._throttle(orgb_unique_id(device), device, mode=mode):
+            return True
+        return self._set_mode(device, mode)
+
+    def _set_mode(self, device, mode):
+        key = orgb_unique_id(device)
+        if not self._data["online"]:
+            return self._queue(key, mode=mode)
+
+        state_cache = self._data[ORGB_STATE_CACHE]
+        if state_cache.skip_mode(key, device, mode):
+            return True
+
+        capabilities = self._data[ORGB_TOPOLOGY].capabilities(key, device)
+        try:
+            device.set_mode(capabilities.modes[mode])
+        except ConnectionError:
+            self._data["connection_failed"]()
+            return self._queue(key, mode=mode)
+
+        state_cache.record_mode(key, mode)
+        return True